@@ -24,10 +24,12 @@ def set_brazilian_locale():
             return False
 br_locale_ok = set_brazilian_locale()
 
+_TROCA_SEPARADORES = str.maketrans(',.', '.,')
+
 def moeda_br(valor):
     if br_locale_ok:
         return locale.currency(valor, grouping=True)
-    return f"R$ {valor:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
+    return f"R$ {valor:,.2f}".translate(_TROCA_SEPARADORES)
 
 def calcular_data_final(data_inicio, num_dias, dias_uteis=False):
     cal = Brazil() if dias_uteis else None
@@ -43,6 +43,12 @@ faixas_ir_simplificado = [
 # Valor da dedução por dependente
 deducao_dependente = 189.59
 
+_TROCA_SEPARADORES = str.maketrans(',.', '.,')
+
+# Função para formatar valores no padrão monetário brasileiro (R$ 1.234,56)
+def formatar_moeda_br(valor):
+    return f"R$ {valor:,.2f}".translate(_TROCA_SEPARADORES)
+
 # Função para calcular o INSS
 def calcular_inss(salario_bruto):
     if salario_bruto <= 0:
@@ -128,19 +134,19 @@ col1, col2 = st.columns(2)
 
 with col1:
     st.header("Cálculo Tradicional")
-    st.metric("Base de Cálculo", f"R$ {base_calculo_tradicional:,.2f}".replace(",", "X").replace(".", ",").replace("X", "."))
-    st.metric("INSS", f"R$ {inss:,.2f}".replace(",", "X").replace(".", ",").replace("X", "."))
-    st.metric("Dedução por Dependentes", f"R$ {deducao_total_dependentes:,.2f}".replace(",", "X").replace(".", ",").replace("X", "."))
-    st.metric("Outras Deduções", f"R$ {outras_deducoes:,.2f}".replace(",", "X").replace(".", ",").replace("X", "."))
-    st.metric("IR a Pagar (Tradicional)", f"R$ {ir_tradicional:,.2f}".replace(",", "X").replace(".", ",").replace("X", "."), 
+    st.metric("Base de Cálculo", formatar_moeda_br(base_calculo_tradicional))
+    st.metric("INSS", formatar_moeda_br(inss))
+    st.metric("Dedução por Dependentes", formatar_moeda_br(deducao_total_dependentes))
+    st.metric("Outras Deduções", formatar_moeda_br(outras_deducoes))
+    st.metric("IR a Pagar (Tradicional)", formatar_moeda_br(ir_tradicional), 
               delta_color="inverse")
 
 with col2:
     st.header("Cálculo Simplificado")
-    st.metric("Base de Cálculo", f"R$ {base_calculo_simplificado:,.2f}".replace(",", "X").replace(".", ",").replace("X", "."))
-    st.metric("INSS", f"R$ {inss:,.2f}".replace(",", "X").replace(".", ",").replace("X", "."))
-    st.metric("Dedução Simplificada (20%)", f"R$ {deducao_simplificada:,.2f}".replace(",", "X").replace(".", ",").replace("X", "."))
-    st.metric("IR a Pagar (Simplificado)", f"R$ {ir_simplificado:,.2f}".replace(",", "X").replace(".", ",").replace("X", "."), 
+    st.metric("Base de Cálculo", formatar_moeda_br(base_calculo_simplificado))
+    st.metric("INSS", formatar_moeda_br(inss))
+    st.metric("Dedução Simplificada (20%)", formatar_moeda_br(deducao_simplificada))
+    st.metric("IR a Pagar (Simplificado)", formatar_moeda_br(ir_simplificado), 
               delta_color="inverse")
 
 # Comparação entre os dois métodos
@@ -148,9 +154,9 @@ st.header("Comparação")
 diferenca = ir_tradicional - ir_simplificado
 
 if diferenca > 0:
-    st.success(f"O cálculo simplificado é mais vantajoso em R$ {abs(diferenca):,.2f}".replace(",", "X").replace(".", ",").replace("X", "."))
+    st.success(f"O cálculo simplificado é mais vantajoso em {formatar_moeda_br(abs(diferenca))}")
 elif diferenca < 0:
-    st.info(f"O cálculo tradicional é mais vantajoso em R$ {abs(diferenca):,.2f}".replace(",", "X").replace(".", ",").replace("X", "."))
+    st.info(f"O cálculo tradicional é mais vantajoso em {formatar_moeda_br(abs(diferenca))}")
 else:
     st.warning("Ambos os métodos resultam no mesmo valor de imposto")
 
@@ -162,27 +168,27 @@ tab1, tab2, tab3 = st.tabs(["INSS", "IR Tradicional", "IR Simplificado"])
 with tab1:
     st.subheader("Tabela de Contribuição Previdenciária (INSS) 2024")
     df_inss = pd.DataFrame(faixas_inss)
-    df_inss["inicio"] = df_inss["inicio"].apply(lambda x: f"R$ {x:,.2f}".replace(",", "X").replace(".", ",").replace("X", "."))
-    df_inss["fim"] = df_inss["fim"].apply(lambda x: f"R$ {x:,.2f}".replace(",", "X").replace(".", ",").replace("X", "."))
+    df_inss["inicio"] = df_inss["inicio"].map(formatar_moeda_br)
+    df_inss["fim"] = df_inss["fim"].map(formatar_moeda_br)
     df_inss["aliquota"] = df_inss["aliquota"].apply(lambda x: f"{x*100:.1f}%")
     st.dataframe(df_inss, hide_index=True)
 
 with tab2:
     st.subheader("Tabela do Imposto de Renda (Cálculo Tradicional) 2024")
     df_ir_trad = pd.DataFrame(faixas_ir_tradicional)
-    df_ir_trad["inicio"] = df_ir_trad["inicio"].apply(lambda x: f"R$ {x:,.2f}".replace(",", "X").replace(".", ",").replace("X", "."))
-    df_ir_trad["fim"] = df_ir_trad["fim"].apply(lambda x: f"R$ {x:,.2f}".replace(",", "X").replace(".", ",").replace("X", "."))
+    df_ir_trad["inicio"] = df_ir_trad["inicio"].map(formatar_moeda_br)
+    df_ir_trad["fim"] = df_ir_trad["fim"].map(formatar_moeda_br)
     df_ir_trad["aliquota"] = df_ir_trad["aliquota"].apply(lambda x: f"{x*100:.1f}%")
-    df_ir_trad["deducao"] = df_ir_trad["deducao"].apply(lambda x: f"R$ {x:,.2f}".replace(",", "X").replace(".", ",").replace("X", "."))
+    df_ir_trad["deducao"] = df_ir_trad["deducao"].map(formatar_moeda_br)
     st.dataframe(df_ir_trad, hide_index=True)
 
 with tab3:
     st.subheader("Tabela do Imposto de Renda (Cálculo Simplificado) 2024")
     df_ir_simp = pd.DataFrame(faixas_ir_simplificado)
-    df_ir_simp["inicio"] = df_ir_simp["inicio"].apply(lambda x: f"R$ {x:,.2f}".replace(",", "X").replace(".", ",").replace("X", "."))
-    df_ir_simp["fim"] = df_ir_simp["fim"].apply(lambda x: f"R$ {x:,.2f}".replace(",", "X").replace(".", ",").replace("X", "."))
+    df_ir_simp["inicio"] = df_ir_simp["inicio"].map(formatar_moeda_br)
+    df_ir_simp["fim"] = df_ir_simp["fim"].map(formatar_moeda_br)
     df_ir_simp["aliquota"] = df_ir_simp["aliquota"].apply(lambda x: f"{x*100:.1f}%")
-    df_ir_simp["deducao"] = df_ir_simp["deducao"].apply(lambda x: f"R$ {x:,.2f}".replace(",", "X").replace(".", ",").replace("X", "."))
+    df_ir_simp["deducao"] = df_ir_simp["deducao"].map(formatar_moeda_br)
     st.dataframe(df_ir_simp, hide_index=True)
 
 # Informações adicionais
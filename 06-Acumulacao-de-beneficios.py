@@ -24,9 +24,11 @@ SALARIOS_MINIMOS = {
     2025: {month: 1518.00 for month in range(1, 13)}
 }
 
+_TROCA_SEPARADORES = str.maketrans(',.', '.,')
+
 def formatar_moeda_br(valor):
     """Formata valor no padrão monetário brasileiro: 0.000,00"""
-    return f"R$ {valor:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
+    return f"R$ {valor:,.2f}".translate(_TROCA_SEPARADORES)
 
 def obter_salario_minimo(data):
     """Retorna o salário mínimo vigente na data especificada"""
@@ -161,11 +163,15 @@ def gerar_pdf_acumulacao(resultados, numero_processo, polo_ativo, polo_passivo,
         pdf.cell(45, 6, "Valor Recebido (R$)", 1, 1, 'C')
         
         # Dados da tabela
-        for _, row in resultados['detalhes_df'].iterrows():
-            pdf.cell(50, 6, unidecode(str(row['Faixa'])), 1, 0)
-            pdf.cell(45, 6, formatar_moeda_br(row['Valor da Faixa (R$)']), 1, 0, 'R')
-            pdf.cell(35, 6, f"{row['Percentual Aplicado']:.0%}", 1, 0, 'C')
-            pdf.cell(45, 6, formatar_moeda_br(row['Valor Recebido (R$)']), 1, 1, 'R')
+        detalhes = resultados['detalhes_df']
+        for faixa, valor_faixa, percentual, valor_recebido in zip(
+            detalhes['Faixa'], detalhes['Valor da Faixa (R$)'],
+            detalhes['Percentual Aplicado'], detalhes['Valor Recebido (R$)']
+        ):
+            pdf.cell(50, 6, unidecode(str(faixa)), 1, 0)
+            pdf.cell(45, 6, formatar_moeda_br(valor_faixa), 1, 0, 'R')
+            pdf.cell(35, 6, f"{percentual:.0%}", 1, 0, 'C')
+            pdf.cell(45, 6, formatar_moeda_br(valor_recebido), 1, 1, 'R')
         
         pdf.ln(10)
         
@@ -1,7 +1,9 @@
 import streamlit as st
-import pdfplumber
 import re
 import pandas as pd
+from io import BytesIO
+
+from leitura_pdf import extrair_textos
 
 # Configuração da página
 st.set_page_config(
@@ -111,77 +113,102 @@ if 'dados_extracao' not in st.session_state:
 if 'rubricas_analise' not in st.session_state:
     st.session_state.rubricas_analise = None
 
+# Linhas irrelevantes (competência inicial/final, nascimento, data/hora de emissão)
+# numa única alternação: uma varredura por linha em vez de cinco buscas
+LINHA_IGNORADA_RE = re.compile(
+    r'Compet\.\s*(?:Inicial|Final)|Nasc|\d{2}/[A-Za-z]{3}/\d{4}\s+\d{2}:\d{2}:\d{2}',
+    re.IGNORECASE
+)
+
+# Padrões aplicados a cada linha do HISCRE, compilados uma única vez
+NOME_RE = re.compile(r'Nome:\s*([A-Z\s\.\-ÇÃÁÉÍÓÚÂÊÔ]+)')
+NB_RE = re.compile(r'NB:\s*([\d\.\-]+)')
+RUBRICA_RE = re.compile(r'^(\d{3})\s+([A-Z0-9\s\.\-ÇÃÁÉÍÓÚÂÊÔ\/]+)\s+R\$[\s]*([\d\.,]+)')
+
+# Remove os dígitos ASCII de uma string (teste de formato por caracteres)
+_SEM_DIGITOS = str.maketrans('', '', '0123456789')
+
+# Troca ',' <-> '.' numa única passada (formato monetário brasileiro)
+_TROCA_SEPARADORES = str.maketrans(',.', '.,')
+
+def formatar_moeda_br(valor):
+    return f"R$ {valor:,.2f}".translate(_TROCA_SEPARADORES)
+
+# Texto de cada página, extraído uma vez por arquivo: a busca e a análise
+# de rubricas (e os reruns do Streamlit) reaproveitam o mesmo resultado
+@st.cache_data(show_spinner=False)
+def extrair_textos_pdf(pdf_bytes):
+    return extrair_textos(pdf_bytes)
+
 # Função para extrair dados da busca
 def extrair_dados_pdf(file, rubricas_filtrar):
-    dados = []
+    # Uma lista por coluna: o DataFrame é montado de uma vez, sem um dict por linha
+    dados = {coluna: [] for coluna in ('p.p HISCRE', 'Comp.', 'Rubrica', 'Descrição', 'Valor (R$)', 'Status')}
     nome = ""
     nbs = set()
     competencia_atual = None
     status_atual = None
 
-    with pdfplumber.open(file) as pdf:
-        for num_pagina, pagina in enumerate(pdf.pages, start=1):
-            texto = pagina.extract_text()
-            if texto:
-                linhas = texto.split('\n')
-                for linha in linhas:
-                    # Capturar Nome
-                    nome_match = re.search(r'Nome:\s*([A-Z\s\.\-ÇÃÁÉÍÓÚÂÊÔ]+)', linha)
-                    if nome_match:
-                        nome = nome_match.group(1).strip()
-
-                    # Capturar NB
-                    nb_match = re.findall(r'NB:\s*([\d\.\-]+)', linha)
-                    if nb_match:
-                        nbs.update(nb_match)
-
-                    # Ignorar linhas irrelevantes
-                    if (
-                        re.search(r'Compet\.\s*Inicial', linha, re.IGNORECASE)
-                        or re.search(r'Compet\.\s*Final', linha, re.IGNORECASE)
-                        or re.search(r'Nasc', linha, re.IGNORECASE)
-                        or re.search(r'Data de Nascimento', linha, re.IGNORECASE)
-                        or re.search(r'\d{2}/[A-Za-z]{3}/\d{4}\s+\d{2}:\d{2}:\d{2}', linha)
-                    ):
-                        continue
-
-                    # Atualizar competência
-                    comp_match = re.match(r'^(\d{2}/\d{4})', linha.strip())
-                    if comp_match and not re.match(r'^\d{3}\s', linha.strip()):
-                        competencia_atual = comp_match.group(1)
-
-                    # Status
-                    if "Pago" in linha:
-                        status_atual = "Pago"
-                    elif "Não Pago" in linha:
-                        status_atual = "Não Pago"
-
-                    # Rubrica
-                    rubrica_match = re.match(r'^(\d{3})\s+([A-Z0-9\s\.\-ÇÃÁÉÍÓÚÂÊÔ\/]+)\s+R\$[\s]*([\d\.,]+)', linha)
-                    if rubrica_match:
-                        rubrica = rubrica_match.group(1)
-                        descricao = rubrica_match.group(2).strip()
-                        valor_texto = rubrica_match.group(3).replace('.', '').replace(',', '.')
-                        valor_float = float(valor_texto)
-                        if not rubricas_filtrar or rubrica in rubricas_filtrar:
-                            dados.append({
-                                'p.p HISCRE': num_pagina,
-                                'Comp.': competencia_atual if competencia_atual else "Não encontrada",
-                                'Rubrica': rubrica,
-                                'Descrição': descricao,
-                                'Valor (R$)': valor_float,
-                                'Status': status_atual if status_atual else "Não encontrado"
-                            })
-
-    df = pd.DataFrame(dados)
+    for num_pagina, texto in enumerate(extrair_textos_pdf(file.getvalue()), start=1):
+        if texto:
+            linhas = texto.split('\n')
+            for linha in linhas:
+                # Capturar Nome
+                nome_match = NOME_RE.search(linha)
+                if nome_match:
+                    nome = nome_match.group(1).strip()
+
+                # Capturar NB
+                nb_match = NB_RE.findall(linha)
+                if nb_match:
+                    nbs.update(nb_match)
+
+                # Ignorar linhas irrelevantes
+                if LINHA_IGNORADA_RE.search(linha):
+                    continue
+
+                # Atualizar competência ("MM/AAAA" no início da linha, testado sem regex;
+                # com "/" na 3ª posição a linha nunca é de rubrica "999 ...")
+                comp = linha.strip()[:7]
+                if len(comp) == 7 and comp[2] == '/' and comp.translate(_SEM_DIGITOS) == '/':
+                    competencia_atual = comp
+
+                # Status
+                if "Pago" in linha:
+                    status_atual = "Pago"
+                elif "Não Pago" in linha:
+                    status_atual = "Não Pago"
+
+                # Rubrica
+                rubrica_match = RUBRICA_RE.match(linha)
+                if rubrica_match:
+                    rubrica = rubrica_match.group(1)
+                    descricao = rubrica_match.group(2).strip()
+                    valor_texto = rubrica_match.group(3).replace('.', '').replace(',', '.')
+                    valor_float = float(valor_texto)
+                    if not rubricas_filtrar or rubrica in rubricas_filtrar:
+                        dados['p.p HISCRE'].append(num_pagina)
+                        dados['Comp.'].append(competencia_atual if competencia_atual else "Não encontrada")
+                        dados['Rubrica'].append(rubrica)
+                        dados['Descrição'].append(descricao)
+                        dados['Valor (R$)'].append(valor_float)
+                        dados['Status'].append(status_atual if status_atual else "Não encontrado")
+
+    # Colunas repetitivas como categoria: o .str abaixo e o filtro de "Pago"
+    # trabalham sobre os valores distintos, não sobre cada linha
+    df = pd.DataFrame(dados).astype({
+        'Comp.': 'category',
+        'Rubrica': 'category',
+        'Descrição': 'category',
+        'Status': 'category'
+    })
     if not df.empty:
         # Ordenar por competência
-        df['Ordenar'] = pd.to_datetime(df['Comp.'].str.extract(r'(\d{2})/(\d{4})').apply(
-            lambda x: f"{x[1]}-{x[0]}-01", axis=1), errors='coerce')
-        df = df.sort_values(by='Ordenar').drop(columns=['Ordenar'])
-
-        # Formatar valor para Real
-        df['Valor (R$)'] = df['Valor (R$)'].map(lambda x: f"R$ {x:,.2f}".replace(",", "X").replace(".", ",").replace("X", "."))
+        # Chave numérica AAAAMM (sem apply por linha nem montagem de datas);
+        # "Não encontrada" vira NaN e vai para o final, como antes
+        mes_ano = df['Comp.'].str.extract(r'(\d{2})/(\d{4})').astype(float)
+        df['Ordenar'] = mes_ano[1] * 100 + mes_ano[0]
+        df = df.sort_values(by='Ordenar', kind='stable').drop(columns=['Ordenar'])
 
         df = df.reset_index(drop=True)
 
@@ -191,27 +218,25 @@ def extrair_dados_pdf(file, rubricas_filtrar):
 def extrair_todas_rubricas(file):
     rubricas_encontradas = {}
     
-    with pdfplumber.open(file) as pdf:
-        for num_pagina, pagina in enumerate(pdf.pages, start=1):
-            texto = pagina.extract_text()
-            if texto:
-                linhas = texto.split('\n')
-                for linha in linhas:
-                    # Padrão para identificar rubricas
-                    rubrica_match = re.match(r'^(\d{3})\s+([A-Z0-9\s\.\-ÇÃÁÉÍÓÚÂÊÔ\/]+)\s+R\$[\s]*([\d\.,]+)', linha)
-                    if rubrica_match:
-                        rubrica = rubrica_match.group(1)
-                        descricao = rubrica_match.group(2).strip()
+    for texto in extrair_textos_pdf(file.getvalue()):
+        if texto:
+            linhas = texto.split('\n')
+            for linha in linhas:
+                # Padrão para identificar rubricas
+                rubrica_match = RUBRICA_RE.match(linha)
+                if rubrica_match:
+                    rubrica = rubrica_match.group(1)
+                    descricao = rubrica_match.group(2).strip()
                         
-                        if rubrica in rubricas_encontradas:
-                            rubricas_encontradas[rubrica]["ocorrencias"] += 1
-                        else:
-                            descricao_ref = descricoes_rubricas.get(rubrica, "Não encontrada na referência")
-                            rubricas_encontradas[rubrica] = {
-                                "descricao_doc": descricao,
-                                "descricao_ref": descricao_ref,
-                                "ocorrencias": 1
-                            }
+                    if rubrica in rubricas_encontradas:
+                        rubricas_encontradas[rubrica]["ocorrencias"] += 1
+                    else:
+                        descricao_ref = descricoes_rubricas.get(rubrica, "Não encontrada na referência")
+                        rubricas_encontradas[rubrica] = {
+                            "descricao_doc": descricao,
+                            "descricao_ref": descricao_ref,
+                            "ocorrencias": 1
+                        }
     
     return rubricas_encontradas
 
@@ -485,11 +510,12 @@ with aba2:
             rubricas_sem_ref = len(df_rubricas[df_rubricas['Descrição de Referência'] == "Não encontrada na referência"])
             st.metric("Rubricas sem Referência", rubricas_sem_ref)
         
-        # Download do CSV
-        csv = df_rubricas.to_csv(index=False, encoding='utf-8-sig')
+        # Download do CSV (escrito direto em bytes, com o BOM do utf-8-sig)
+        csv = BytesIO()
+        df_rubricas.to_csv(csv, index=False, encoding='utf-8-sig')
         st.download_button(
             label="⬇️ Baixar Relatório de Rubricas",
-            data=csv,
+            data=csv.getvalue(),
             file_name='rubricas_unicas_hiscre.csv',
             mime='text/csv',
             key="download_analise"
@@ -599,14 +625,17 @@ with aba3:
         if len(df_filtrado) == 0:
             st.info("Nenhuma rubrica encontrada para o filtro selecionado.")
         else:
-            st.dataframe(df_filtrado)
+            # O valor fica numérico na extração; só as linhas exibidas são formatadas em Real
+            df_exibicao = df_filtrado.assign(**{'Valor (R$)': df_filtrado['Valor (R$)'].map(formatar_moeda_br)})
+            st.dataframe(df_exibicao)
             st.write(f"Quantidade de ocorrências exibidas: **{len(df_filtrado)}**")
 
-            # Exportar o CSV
-            csv = df_filtrado.to_csv(index=False, sep=";", encoding='utf-8-sig')
+            # Exportar o CSV (escrito direto em bytes, com o BOM do utf-8-sig)
+            csv = BytesIO()
+            df_exibicao.to_csv(csv, index=False, sep=";", encoding='utf-8-sig')
             st.download_button(
                 label="⬇️ Baixar CSV",
-                data=csv,
+                data=csv.getvalue(),
                 file_name='rubricas_por_competencia.csv',
                 mime='text/csv',
             )
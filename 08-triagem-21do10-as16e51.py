@@ -496,12 +496,12 @@ def criar_relatorio_filtros(df_filtrado, filtros_aplicados):
         pdf.ln()
         
         pdf.set_font('Arial', '', 7)
-        for _, row in df_filtrado.iterrows():
-            n_processo = str(row['Nº Processo']) if pd.notna(row['Nº Processo']) else ''
-            polo_ativo = str(row['Polo Ativo']) if pd.notna(row['Polo Ativo']) else ''
-            data_chegada = str(row['Data Chegada']) if pd.notna(row['Data Chegada']) else ''
-            servidor = str(row['Servidor']) if pd.notna(row['Servidor']) else ''
-            assunto = str(row['Assunto Principal']) if pd.notna(row['Assunto Principal']) else ''
+        # Colunas do relatório como listas de texto ('' quando ausente), sem montar uma Series por linha
+        colunas_texto = [
+            [str(valor) if pd.notna(valor) else '' for valor in df_filtrado[coluna]]
+            for coluna in ('Nº Processo', 'Polo Ativo', 'Data Chegada', 'Servidor', 'Assunto Principal')
+        ]
+        for n_processo, polo_ativo, data_chegada, servidor, assunto in zip(*colunas_texto):
             
             pdf.cell(larguras[0], 8, n_processo[:20], 1)
             pdf.cell(larguras[1], 8, polo_ativo[:25], 1)
@@ -651,12 +651,15 @@ def main():
             
         # 4. Aplicar Atribuições Manuais 
         if not st.session_state.atribuicoes_servidores.empty:
-            df_atribuicoes = st.session_state.atribuicoes_servidores[['NUMERO_PROCESSO', 'servidor']].copy()
-
-            for index, row in df_atribuicoes.iterrows():
-                match_index = processed_df.index[processed_df['NUMERO_PROCESSO'] == row['NUMERO_PROCESSO']]
-                if not match_index.empty:
-                    processed_df.loc[match_index, 'servidor'] = row['servidor']
+            # Processo -> servidor (vale a última atribuição, como no laço linha a linha)
+            atribuicoes = (
+                st.session_state.atribuicoes_servidores
+                .dropna(subset=['NUMERO_PROCESSO'])
+                .drop_duplicates(subset=['NUMERO_PROCESSO'], keep='last')
+                .set_index('NUMERO_PROCESSO')['servidor']
+            )
+            atribuidos = processed_df['NUMERO_PROCESSO'].isin(atribuicoes.index)
+            processed_df.loc[atribuidos, 'servidor'] = processed_df.loc[atribuidos, 'NUMERO_PROCESSO'].map(atribuicoes)
                     
         stats = criar_estatisticas(processed_df)
                     
@@ -851,29 +854,32 @@ def main():
                     default=None
                 )
             
-            filtered_df = processed_df.copy()
+            # Filtros combinados numa única máscara e um único recorte (sem cópia intermediária)
+            mascara = np.ones(len(processed_df), dtype=bool)
             filtros_aplicados = []
             
             if servidor_filter:
-                filtered_df = filtered_df[filtered_df['servidor'].isin(servidor_filter)]
+                mascara &= processed_df['servidor'].isin(servidor_filter).to_numpy()
                 filtros_aplicados.append(f"Servidor: {', '.join(servidor_filter)}")
             
-            if mes_filter and 'mes' in filtered_df.columns:
-                filtered_df = filtered_df[filtered_df['mes'].isin(mes_filter)]
+            if mes_filter and 'mes' in processed_df.columns:
+                mascara &= processed_df['mes'].isin(mes_filter).to_numpy()
                 filtros_aplicados.append(f"Mês (Chegada): {', '.join(map(str, mes_filter))}")
             
-            if polo_passivo_filter and 'POLO_PASSIVO' in filtered_df.columns:
-                filtered_df = filtered_df[filtered_df['POLO_PASSIVO'].isin(polo_passivo_filter)]
+            if polo_passivo_filter and 'POLO_PASSIVO' in processed_df.columns:
+                mascara &= processed_df['POLO_PASSIVO'].isin(polo_passivo_filter).to_numpy()
                 filtros_aplicados.append(f"Polo Passivo: {', '.join(polo_passivo_filter)}")
             
-            if assunto_filter and 'ASSUNTO_PRINCIPAL' in filtered_df.columns:
-                filtered_df = filtered_df[filtered_df['ASSUNTO_PRINCIPAL'].isin(assunto_filter)]
+            if assunto_filter and 'ASSUNTO_PRINCIPAL' in processed_df.columns:
+                mascara &= processed_df['ASSUNTO_PRINCIPAL'].isin(assunto_filter).to_numpy()
                 filtros_aplicados.append(f"Assunto: {', '.join(assunto_filter)}")
             
-            if vara_filter and 'vara' in filtered_df.columns:
-                filtered_df = filtered_df[filtered_df['vara'].isin(vara_filter)]
+            if vara_filter and 'vara' in processed_df.columns:
+                mascara &= processed_df['vara'].isin(vara_filter).to_numpy()
                 filtros_aplicados.append(f"Vara: {', '.join(vara_filter)}")
             
+            filtered_df = processed_df[mascara]
+            
             filtros_texto = " | ".join(filtros_aplicados) if filtros_aplicados else "Nenhum filtro aplicado"
             
             st.metric("Processos Filtrados", len(filtered_df))
@@ -1,5 +1,4 @@
 import streamlit as st
-import pdfplumber
 import pandas as pd
 import re
 import os
@@ -13,14 +12,17 @@ from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.enums import TA_LEFT, TA_CENTER, TA_JUSTIFY # TA_JUSTIFY adicionado
 
+from leitura_pdf import extrair_textos
+
 # ------------------------------------------------------------
 # Configurações do app
 # ------------------------------------------------------------
 st.set_page_config(page_title="Relatório Serviço Extraordinário", layout="wide")
 
-# REGEX ATUALIZADA para aceitar uma letra maiúscula opcional ([A-Z]?) no final do processo
+# REGEX ATUALIZADA para aceitar uma letra maiúscula opcional ([A-Z]?) no final do processo.
+# A letra (T, S, etc.) fica fora do grupo: o processo já sai limpo do findall
 REGEX = re.compile(
-    r"(\d{7}-\d{2}\.\d{4}\.\d\.\d{2}\.\d{4}[A-Z]?)\s+(\d{2}\/\d{2}\/\d{4})\s+(\d+)"
+    r"(\d{7}-\d{2}\.\d{4}\.\d\.\d{2}\.\d{4})[A-Z]?\s+(\d{2}\/\d{2}\/\d{4})\s+(\d+)"
 )
 
 PASTA_MENSAL = "base_mensal"
@@ -33,23 +35,15 @@ MESES_ANUAL = ["Janeiro", "Fevereiro", "Março", "Abril", "Maio", "Junho",
 # Funções de Processamento
 # ------------------------------------------------------------
 def extrair_processos(pdf_file):
-    dados = []
-    with pdfplumber.open(pdf_file) as pdf:
-        for page in pdf.pages:
-            texto = page.extract_text()
-            if not texto:
-                continue
-            encontrados = REGEX.findall(texto)
-            for processo_bruto, data, seq in encontrados:
-                
-                # LIMPEZA: Remove a letra no final do processo (T, S, etc.), se existir.
-                processo_limpo = re.sub(r'[A-Z]$', '', processo_bruto)
-                
-                dados.append({
-                    "processo": processo_limpo,  # Usa o processo limpo
-                    "data": pd.to_datetime(data, dayfirst=True),
-                    "sequencial": int(seq)
-                })
+    # Uma lista por coluna: o DataFrame é montado de uma vez, sem um dict por processo
+    dados = {coluna: [] for coluna in ("processo", "data", "sequencial")}
+    for texto in extrair_textos(pdf_file.getvalue()):
+        if not texto:
+            continue
+        for processo, data, seq in REGEX.findall(texto):
+            dados["processo"].append(processo)
+            dados["data"].append(data)  # já no formato DD/MM/AAAA gravado na planilha
+            dados["sequencial"].append(int(seq))
     return dados
 
 
@@ -61,9 +55,15 @@ def salvar_mensal(mes_ano, df):
     df.to_excel(caminho, index=False)
 
 
+@st.cache_data(show_spinner=False)
+def ler_planilha_mensal(caminho, mtime):
+    """Lê a planilha do mês; relida só quando o arquivo muda (mtime na chave do cache)."""
+    return pd.read_excel(caminho)
+
+
 def carregar_mensal(mes_ano):
     caminho = os.path.join(PASTA_MENSAL, f"{mes_ano}.xlsx")
-    return pd.read_excel(caminho)
+    return ler_planilha_mensal(caminho, os.path.getmtime(caminho))
 
 
 # ------------------------------------------------------------
@@ -105,16 +105,16 @@ def gerar_pdf(titulo, df, observacoes="", obs_titulo="Observações"):
         meses_map_index = {m: i for i, m in enumerate(MESES_ANUAL)}
         totais_mes['mes_nome'] = totais_mes['mes'].str.split('_').str[0]
         
-        totais_mes['order'] = totais_mes.apply(
-            lambda row: meses_map_index.get(row['mes_nome'], 99) + int(row['mes'].split('_')[1]) * 100, 
-            axis=1
+        totais_mes['order'] = (
+            totais_mes['mes_nome'].map(meses_map_index).fillna(99).astype(int)
+            + totais_mes['mes'].str.split('_').str[1].astype(int) * 100
         )
         
         totais_mes = totais_mes.sort_values(by='order').drop(columns=['order', 'mes_nome'])
         
         dados_tabela = [["Mês", "Total de Processos"]]
-        for _, row in totais_mes.iterrows():
-            dados_tabela.append([row['mes'], str(row['Total'])])
+        for mes, total in zip(totais_mes['mes'], totais_mes['Total']):
+            dados_tabela.append([mes, str(total)])
 
         # Total Geral (sem tags HTML, formatado via TableStyle)
         dados_tabela.append(['Total Geral', str(len(df))])
@@ -162,11 +162,9 @@ def gerar_pdf(titulo, df, observacoes="", obs_titulo="Observações"):
     # Recria o sequencial (1 a N) após a ordenação
     df.insert(0, "nº", (df.reset_index(drop=True).index + 1).astype(str))
     
-    for index, row in df.iterrows():
-        n_sequencial = f"{row['nº']}."
-        
+    for n_sequencial, processo, data in zip(df['nº'], df['processo'], df['data']):
         # Formato: 1. PROCESSO — 08/11/2025
-        texto = f"{n_sequencial} {row['processo']} — {row['data']}"
+        texto = f"{n_sequencial}. {processo} — {data}"
         Story.append(Paragraph(texto, styles['NormalLeft']))
         
     doc.build(Story)
@@ -206,26 +204,20 @@ if aba == "Upload de Múltiplos Meses":
             total_processado = 0
             for mes, arq in arquivos_enviados.items():
                 mes_ano = f"{mes}_{ano}"
-                lista = []
                 
                 dados = extrair_processos(arq)
-                if dados:
-                    for d in dados:
-                        d["arquivo_origem"] = arq.name
-                        lista.append(d)
-
-                    if lista:
-                        df = pd.DataFrame(lista)
-                        df["data"] = df["data"].dt.strftime("%d/%m/%Y") 
-                        df = df.drop(columns=["sequencial"])
-
-                        df.insert(0, "nº", (df.reset_index().index + 1).astype(str).str.zfill(2))
-
-                        salvar_mensal(mes_ano, df)
-                        st.success(f"✅ {mes_ano} salvo: {len(df)} processos.")
-                        total_processado += len(df)
-                    else:
-                        st.warning(f"⚠️ {mes_ano}: Nenhum processo encontrado no PDF.")
+                if dados["processo"]:
+                    df = pd.DataFrame(dados)
+                    df["arquivo_origem"] = arq.name
+                    df = df.drop(columns=["sequencial"])
+
+                    df.insert(0, "nº", (df.reset_index().index + 1).astype(str).str.zfill(2))
+
+                    salvar_mensal(mes_ano, df)
+                    st.success(f"✅ {mes_ano} salvo: {len(df)} processos.")
+                    total_processado += len(df)
+                else:
+                    st.warning(f"⚠️ {mes_ano}: Nenhum processo encontrado no PDF.")
             
             if total_processado > 0:
                  st.balloons()
@@ -4,24 +4,22 @@ import pdfplumber
 import re
 from io import BytesIO
 from datetime import datetime
-# Importamos NumberFormat do openpyxl para formatar datas e números
-from openpyxl.styles import numbers
 
 # ------------------------------------------------------------
 # Funções de conversão e extração
 # ------------------------------------------------------------
 
+# Mapeamento de meses em português para inglês (montado uma única vez)
+MESES_PT_EN = {
+    'jan': 'Jan', 'fev': 'Feb', 'mar': 'Mar', 'abr': 'Apr', 'mai': 'May', 'jun': 'Jun',
+    'jul': 'Jul', 'ago': 'Aug', 'set': 'Sep', 'out': 'Oct', 'nov': 'Nov', 'dez': 'Dec'
+}
+
 def converter_competencia(competencia):
     """Converte competência no formato 'Mmm/AA' para data válida"""
     try:
-        # Mapeamento de meses em português para inglês
-        meses_pt_en = {
-            'jan': 'Jan', 'fev': 'Feb', 'mar': 'Mar', 'abr': 'Apr', 'mai': 'May', 'jun': 'Jun',
-            'jul': 'Jul', 'ago': 'Aug', 'set': 'Sep', 'out': 'Oct', 'nov': 'Nov', 'dez': 'Dec'
-        }
-        
         mes_pt, ano = competencia.split('/')
-        mes_en = meses_pt_en.get(mes_pt.lower(), mes_pt)
+        mes_en = MESES_PT_EN.get(mes_pt.lower(), mes_pt)
         
         # Se o ano tem 2 dígitos, converter para 4 dígitos
         if len(ano) == 2:
@@ -36,45 +34,56 @@ def converter_competencia(competencia):
         # Se não conseguir converter, retorna a competência original
         return competencia
 
+# Padrão para identificar linhas com dados (ex: "jul/94 90,15")
+# Garante que a linha tenha pelo menos dois números separados por espaços
+COMPETENCIA_SALARIO_RE = re.compile(r'([a-z]{3}/\d{2,4})\s+(\d{1,3}(?:\.\d{3})*,\d{2})')
+
 def extract_data_from_pdf(pdf_file):
     """Extrai dados do PDF da planilha RMI"""
-    data = []
+    # Textos capturados por coluna; a conversão numérica é feita em lote no final
+    competencias = []
+    salarios = []
     
     with pdfplumber.open(pdf_file) as pdf:
         for page in pdf.pages:
             text = page.extract_text()
+            page.close()  # libera chars/textmap em cache: só o texto é usado
             
             # Encontrar linhas com dados de competência e salário
             lines = text.split('\n')
             
             for line in lines:
-                # Padrão para identificar linhas com dados (ex: "jul/94 90,15")
-                # Garante que a linha tenha pelo menos dois números separados por espaços
-                pattern = r'([a-z]{3}/\d{2,4})\s+(\d{1,3}(?:\.\d{3})*,\d{2})'
-                matches = re.findall(pattern, line.lower())
-                
-                for match in matches:
-                    competencia, salario = match
-                    # Converter para formato numérico
-                    salario_float = float(salario.replace('.', '').replace(',', '.'))
-                    
-                    # Converter competência para data
-                    competencia_data = converter_competencia(competencia)
-                    
-                    data.append({
-                        'Competencia_Original': competencia.title(),
-                        'Data': competencia_data,
-                        'Ano_Mes': competencia_data.strftime('%Y-%m') if isinstance(competencia_data, datetime) else competencia,
-                        'Salario_Contribuicao': salario_float
-                    })
+                for competencia, salario in COMPETENCIA_SALARIO_RE.findall(line.lower()):
+                    competencias.append(competencia)
+                    salarios.append(salario)
+    
+    if not competencias:
+        return pd.DataFrame()
     
-    df = pd.DataFrame(data)
+    # Converter competência para data
+    datas = [converter_competencia(competencia) for competencia in competencias]
     
-    # Ordenar por data se possível
-    if 'Data' in df.columns:
-        df = df.sort_values('Data')
+    df = pd.DataFrame({
+        'Competencia_Original': [competencia.title() for competencia in competencias],
+        'Data': datas,
+        'Ano_Mes': [
+            data.strftime('%Y-%m') if isinstance(data, datetime) else competencia
+            for data, competencia in zip(datas, competencias)
+        ],
+        # Salários já validados pela regex ("1.234,56"): conversão da coluna inteira de uma vez
+        'Salario_Contribuicao': pd.Series(salarios, dtype=str)
+            .str.replace('.', '', regex=False)
+            .str.replace(',', '.', regex=False)
+            .astype(float)
+    })
     
-    return df
+    # Ordenar por data
+    return df.sort_values('Data')
+
+@st.cache_data(show_spinner=False)
+def extrair_dados_pdf(pdf_bytes):
+    """Extrai os dados do PDF (cache: reruns dos widgets não reprocessam o arquivo)"""
+    return extract_data_from_pdf(BytesIO(pdf_bytes))
 
 # ------------------------------------------------------------
 # Interface Streamlit
@@ -91,7 +100,7 @@ def main():
         try:
             # Extrair dados do PDF
             with st.spinner("Processando arquivo PDF..."):
-                df = extract_data_from_pdf(uploaded_file)
+                df = extrair_dados_pdf(uploaded_file.getvalue())
             
             if not df.empty:
                 st.success(f"Dados extraídos com sucesso! {len(df)} registros encontrados.")
@@ -147,10 +156,8 @@ def main():
                 df_export = df[incluir_colunas].copy()
                 
                 # Renomear a coluna de competência selecionada para "Competencia"
-                coluna_data_nome = None
                 if formato_data == "Data Completa" and "Data" in df_export.columns:
                     df_export = df_export.rename(columns={'Data': 'Competencia'})
-                    coluna_data_nome = 'Competencia'
                 elif formato_data == "Ano-Mês" and "Ano_Mes" in df_export.columns:
                     df_export = df_export.rename(columns={'Ano_Mes': 'Competencia'})
                 elif formato_data == "Original" and "Competencia_Original" in df_export.columns:
@@ -162,40 +169,19 @@ def main():
                 # Criar arquivo Excel em memória
                 output = BytesIO()
                 
-                # Usar a biblioteca openpyxl para aplicar formatação customizada
-                with pd.ExcelWriter(output, engine='openpyxl', datetime_format='dd/mm/yyyy') as writer:
+                # datetime_format já grava as datas como dd/mm/yyyy; o formato numérico
+                # do salário vai na coluna inteira em vez de célula por célula
+                with pd.ExcelWriter(output, engine='xlsxwriter', datetime_format='dd/mm/yyyy') as writer:
                     df_export.to_excel(writer, sheet_name='Salarios_Contribuicao', index=False)
                     
-                    # Ajustar formatação das colunas
                     workbook = writer.book
                     worksheet = writer.sheets['Salarios_Contribuicao']
                     
                     # Formatar coluna de salário como moeda
                     if 'Salario_Contribuicao' in df_export.columns:
                         salario_col_idx = df_export.columns.get_loc('Salario_Contribuicao')
-                        # O openpyxl usa indexação base 1 (A=1, B=2...)
-                        salario_col = salario_col_idx + 1
-                        
-                        # Criar formato de moeda (português/brasileiro)
-                        money_format = numbers.FORMAT_CURRENCY_USD_SIMPLE
-                        
-                        for row in range(2, len(df_export) + 2):
-                            worksheet.cell(row=row, column=salario_col).number_format = '#,##0.00'
-                    
-                    # ------------------------------------------------------------------
-                    # CORREÇÃO CRÍTICA: Forçar formato de Data (DD/MM/AAAA) no Excel
-                    # ------------------------------------------------------------------
-                    if coluna_data_nome == 'Competencia' and formato_data == "Data Completa":
-                        data_col_idx = df_export.columns.get_loc('Competencia')
-                        data_col = data_col_idx + 1
-                        
-                        # Aplicar formato de data 'dd/mm/yyyy' em todas as células de dados
-                        for row in range(2, len(df_export) + 2):
-                            cell = worksheet.cell(row=row, column=data_col)
-                            # Se o valor é um datetime, aplica o formato
-                            if isinstance(cell.value, datetime):
-                                cell.number_format = 'dd/mm/yyyy'
-                    # ------------------------------------------------------------------
+                        money_format = workbook.add_format({'num_format': '#,##0.00'})
+                        worksheet.set_column(salario_col_idx, salario_col_idx, None, money_format)
                 
                 excel_data = output.getvalue()
                 
@@ -4,16 +4,22 @@ import pdfplumber
 import re
 from io import BytesIO
 from datetime import datetime
+from functools import lru_cache
+
+import leitura_pdf
 
 # ------------------------------------------------------------
 # Funções de conversão
 # ------------------------------------------------------------
 
+# Caracteres que não são números ou barra (padrão compilado uma única vez)
+NAO_NUMERO_BARRA_RE = re.compile(r'[^0-9/]')
+
 def converter_competencia(competencia):
     """Converte competência no formato 'MM/AAAA' para data válida"""
     try:
         # Remove caracteres que não são números ou barra
-        competencia = re.sub(r'[^0-9/]', '', str(competencia))
+        competencia = NAO_NUMERO_BARRA_RE.sub('', str(competencia))
         
         if '/' in competencia:
             mes, ano = competencia.split('/')
@@ -61,10 +67,17 @@ def formatar_salario_para_float(salario_str):
 # Funções de extração de dados - MODELO 1 (Específico para o PDF fornecido)
 # ------------------------------------------------------------
 
+# Padrão para identificar linhas com dados: número + data (MM/AAAA) + valores
+# Exemplo: "001 07/1994 R$ 309,24 582,86 309,24 7,521684 R$ 2.326,01"
+LINHA_MODELO1_RE = re.compile(
+    r'^\s*(\d{2,3})\s+(\d{1,2}/\d{4})\s+R\$\s*([\d\.,]+)\s+([\d\.,]+)\s+([\d\.,]+)\s+([\d\.,]+)\s+R\$\s*([\d\.,]+)'
+)
+
 def extract_data_from_pdf_model1(pdf_file):
     """Extrai dados do PDF do Modelo 1 (Específico para a estrutura do PDF fornecido)."""
     st.info("Modelo 1 selecionado: Extração específica para estrutura de tabela do PDF.")
-    data = []
+    # Textos brutos por coluna; as conversões são feitas em lote no final
+    registros = {coluna: [] for coluna in ('Competencia_Original', 'Salario_Texto', 'Pagina', 'Linha')}
     
     # Resetar o ponteiro do arquivo
     pdf_file.seek(0)
@@ -73,6 +86,7 @@ def extract_data_from_pdf_model1(pdf_file):
         for page_num, page in enumerate(pdf.pages):
             # Extrai o texto completo da página
             text = page.extract_text()
+            page.close()  # libera chars/textmap em cache: só o texto é usado
             
             if not text:
                 continue
@@ -86,95 +100,148 @@ def extract_data_from_pdf_model1(pdf_file):
                 if not line:
                     continue
                 
-                # Padrão para identificar linhas com dados: número + data (MM/AAAA) + valores
-                # Exemplo: "001 07/1994 R$ 309,24 582,86 309,24 7,521684 R$ 2.326,01"
-                pattern = r'^\s*(\d{2,3})\s+(\d{1,2}/\d{4})\s+R\$\s*([\d\.,]+)\s+([\d\.,]+)\s+([\d\.,]+)\s+([\d\.,]+)\s+R\$\s*([\d\.,]+)'
-                match = re.search(pattern, line)
+                match = LINHA_MODELO1_RE.match(line)
                 
                 if match:
-                    numero, competencia, salario_contribuicao, teto, salario_considerado, indice, salario_corrigido = match.groups()
-                    
-                    # Processa o registro
-                    salario_float = formatar_salario_para_float(salario_contribuicao)
-                    competencia_data = converter_competencia(competencia)
-                    
-                    if salario_float is not None and competencia_data is not None:
-                        data.append({
-                            'Modelo': "Modelo 1",
-                            'Competencia_Original': competencia,
-                            'Data': competencia_data,
-                            'Ano_Mes': competencia_data.strftime('%Y-%m'),
-                            'Salario_Contribuicao': salario_float,
-                            'Pagina': page_num + 1,
-                            'Linha': line_num + 1
-                        })
+                    registros['Competencia_Original'].append(match.group(2))
+                    registros['Salario_Texto'].append(match.group(3))
+                    registros['Pagina'].append(page_num + 1)
+                    registros['Linha'].append(line_num + 1)
     
-    return pd.DataFrame(data)
+    df = pd.DataFrame(registros)
+    if df.empty:
+        return pd.DataFrame()
+
+    # Salário: com vírgula decimal, remove pontos de milhar e troca a vírgula por ponto
+    salario = df.pop('Salario_Texto')
+    com_virgula = salario.str.contains(',', regex=False)
+    salario = salario.where(~com_virgula, salario.str.replace('.', '', regex=False).str.replace(',', '.', regex=False))
+    df['Salario_Contribuicao'] = pd.to_numeric(salario, errors='coerce')
+
+    # Competência "M/AAAA" ou "MM/AAAA" -> primeiro dia do mês (mês inválido vira NaT)
+    mes_ano = df['Competencia_Original'].str.split('/', n=1, expand=True)
+    df['Data'] = pd.to_datetime('01/' + mes_ano[0].str.zfill(2) + '/' + mes_ano[1], format='%d/%m/%Y', errors='coerce')
+
+    df = df[df['Salario_Contribuicao'].notna() & df['Data'].notna()].reset_index(drop=True)
+    df['Ano_Mes'] = df['Data'].dt.strftime('%Y-%m')
+    df.insert(0, 'Modelo', "Modelo 1")
+    return df[['Modelo', 'Competencia_Original', 'Data', 'Ano_Mes', 'Salario_Contribuicao', 'Pagina', 'Linha']]
 
 # ------------------------------------------------------------
 # Funções de extração de dados - MODELO 2 (Extração de Tabelas Estruturadas)
 # ------------------------------------------------------------
 
+# Termos que identificam a coluna de salário no cabeçalho da tabela
+PALAVRAS_SALARIO = ('salário', 'salario', 'contribuição')
+
+def pagina_tem_cabecalho(texto):
+    """Indica se o texto da página contém os termos do cabeçalho (Data e Salário)."""
+    texto = texto.lower()
+    return 'data' in texto and any(word in texto for word in PALAVRAS_SALARIO)
+
+def extrair_tabelas_pdf(pdf_file):
+    """Retorna, para cada página, a lista de tabelas (listas de linhas de células)."""
+    pdf_file.seek(0)
+    pdf_bytes = pdf_file.read()
+
+    # A detecção de tabelas é a etapa mais cara: páginas sem o cabeçalho (capa,
+    # assinaturas) são puladas antes dela, com um teste barato sobre o texto.
+    # PyMuPDF (detecção em C, bem mais rápida) só com CONTADJEFS_MOTOR_PDF=pymupdf
+    if leitura_pdf.motor_configurado() == "pymupdf":
+        with leitura_pdf.pymupdf.open(stream=pdf_bytes, filetype="pdf") as doc:
+            return [
+                [tabela.extract() for tabela in page.find_tables().tables]
+                if pagina_tem_cabecalho(page.get_text()) else []
+                for page in doc
+            ]
+
+    # Padrão: detecção de tabelas do pdfplumber
+    tabelas = []
+    with pdfplumber.open(BytesIO(pdf_bytes)) as pdf:
+        for page in pdf.pages:
+            # Texto simples: caracteres ordenados pela posição (linha, x), não pela ordem
+            # de desenho no PDF, para que 'data'/'salário' não saiam embaralhados
+            texto = page.extract_text_simple()
+            tabelas.append(page.extract_tables() if pagina_tem_cabecalho(texto) else [])
+            page.close()  # libera objetos/edges em cache: só as tabelas extraídas são usadas
+    return tabelas
+
+@lru_cache(maxsize=256)  # o mesmo cabeçalho se repete em todas as páginas da planilha
+def indices_cabecalho(row):
+    """Índices (data, salário) se a linha for o cabeçalho da tabela; senão None."""
+    celulas = [str(cell).lower() if cell else '' for cell in row]
+    row_text = ' '.join(celulas)
+    if 'data' not in row_text or not any(word in row_text for word in PALAVRAS_SALARIO):
+        return None
+
+    # Índices das colunas fixados no cabeçalho (vale a última coluna que casar)
+    data_col_index = -1
+    salario_col_index = -1
+    for j, cell in enumerate(celulas):
+        if 'data' in cell:
+            data_col_index = j
+        if any(word in cell for word in PALAVRAS_SALARIO):
+            salario_col_index = j
+    return data_col_index, salario_col_index
+
 def extract_data_from_pdf_model2(pdf_file):
     """Extrai dados do PDF do Modelo 2 (Extração de Tabelas Estruturadas)."""
     st.info("Modelo 2 selecionado: Extração via Tabela Estruturada.")
-    data = []
-    
-    pdf_file.seek(0)
+    # Uma lista por coluna: o DataFrame é montado de uma vez, sem um dict por linha
+    registros = {coluna: [] for coluna in ('Competencia_Original', 'Data', 'Salario_Contribuicao', 'Pagina', 'Tabela')}
 
-    with pdfplumber.open(pdf_file) as pdf:
-        for page_num, page in enumerate(pdf.pages):
-            # Tenta extrair tabelas
-            tables = page.extract_tables()
-            
-            for table_num, table in enumerate(tables):
-                if not table or len(table) < 2:
+    for page_num, tables in enumerate(extrair_tabelas_pdf(pdf_file)):
+        for table_num, table in enumerate(tables):
+            if not table or len(table) < 2:
+                continue
+
+            # Procura pela linha de cabeçalho que contém "Data" e "Salário"
+            for i, row in enumerate(table):
+                if not row:
                     continue
 
-                # Procura pela linha de cabeçalho que contém "Data" e "Salário"
-                for i, row in enumerate(table):
-                    if not row:
-                        continue
-                        
-                    row_text = ' '.join([str(cell) if cell else '' for cell in row]).lower()
+                indices = indices_cabecalho(tuple(row))
+                if indices is not None:
+                    data_col_index, salario_col_index = indices
+
+                    if data_col_index == -1 or salario_col_index == -1:
+                        break
+                    largura_minima = max(data_col_index, salario_col_index) + 1
                     
-                    if 'data' in row_text and any(word in row_text for word in ['salário', 'salario', 'contribuição']):
-                        # Encontra os índices das colunas
-                        data_col_index = -1
-                        salario_col_index = -1
-                        
-                        for j, cell in enumerate(row):
-                            if cell and 'data' in str(cell).lower():
-                                data_col_index = j
-                            if cell and any(word in str(cell).lower() for word in ['salário', 'salario', 'contribuição']):
-                                salario_col_index = j
-                        
-                        # Processa as linhas seguintes
-                        for k in range(i + 1, len(table)):
-                            row_data = table[k]
-                            if (row_data and len(row_data) > max(data_col_index, salario_col_index) and
-                                data_col_index != -1 and salario_col_index != -1):
-                                
-                                competencia = row_data[data_col_index]
-                                salario = row_data[salario_col_index]
+                    # Processa as linhas seguintes: acesso direto pelas colunas do cabeçalho
+                    for row_data in table[i + 1:]:
+                        if row_data and len(row_data) >= largura_minima:
+                            
+                            competencia = row_data[data_col_index]
+                            salario = row_data[salario_col_index]
+                            
+                            if competencia and salario:
+                                salario_float = formatar_salario_para_float(str(salario))
+                                competencia_data = converter_competencia(str(competencia))
                                 
-                                if competencia and salario:
-                                    salario_float = formatar_salario_para_float(str(salario))
-                                    competencia_data = converter_competencia(str(competencia))
-                                    
-                                    if salario_float is not None and competencia_data is not None:
-                                        data.append({
-                                            'Modelo': "Modelo 2",
-                                            'Competencia_Original': str(competencia),
-                                            'Data': competencia_data,
-                                            'Ano_Mes': competencia_data.strftime('%Y-%m'),
-                                            'Salario_Contribuicao': salario_float,
-                                            'Pagina': page_num + 1,
-                                            'Tabela': table_num + 1
-                                        })
-                        break
-    
-    return pd.DataFrame(data)
+                                if salario_float is not None and competencia_data is not None:
+                                    registros['Competencia_Original'].append(str(competencia))
+                                    registros['Data'].append(competencia_data)
+                                    registros['Salario_Contribuicao'].append(salario_float)
+                                    registros['Pagina'].append(page_num + 1)
+                                    registros['Tabela'].append(table_num + 1)
+                    break
+
+    if not registros['Data']:
+        return pd.DataFrame()
+
+    df = pd.DataFrame(registros)
+    # Colunas derivadas calculadas em lote, na ordem de colunas de antes
+    df.insert(0, 'Modelo', "Modelo 2")
+    df.insert(3, 'Ano_Mes', df['Data'].dt.strftime('%Y-%m'))
+    return df
+
+@st.cache_data(show_spinner=False)
+def extrair_dados_pdf(pdf_bytes, extraction_model):
+    """Extrai os dados com o modelo escolhido (cache: conteúdo do PDF + modelo)."""
+    if "Modelo 1" in extraction_model:
+        return extract_data_from_pdf_model1(BytesIO(pdf_bytes))
+    return extract_data_from_pdf_model2(BytesIO(pdf_bytes))
 
 # ------------------------------------------------------------
 # Interface Streamlit
@@ -197,15 +264,9 @@ def main():
     
     if uploaded_file is not None:
         try:
-            # Selecionar a função de extração
-            if "Modelo 1" in extraction_model:
-                extraction_func = extract_data_from_pdf_model1
-            else:
-                extraction_func = extract_data_from_pdf_model2
-
-            # Extrair dados do PDF
+            # Extrair dados do PDF (reruns dos widgets de exportação usam o cache)
             with st.spinner(f"Processando arquivo PDF com {extraction_model}..."):
-                df = extraction_func(uploaded_file)
+                df = extrair_dados_pdf(uploaded_file.getvalue(), extraction_model)
             
             if not df.empty:
                 st.success(f"✅ Dados extraídos com sucesso! **{len(df)} registros** encontrados.")
@@ -300,31 +361,19 @@ def main():
                 
                 output = BytesIO()
                 
-                # 1. Usamos datetime_format='dd/mm/yyyy' para formatar colunas datetime do Pandas.
-                with pd.ExcelWriter(output, engine='openpyxl', datetime_format='dd/mm/yyyy') as writer:
+                # datetime_format já grava as datas como dd/mm/yyyy; o formato de moeda
+                # vai na coluna inteira (uma chamada) em vez de célula por célula
+                with pd.ExcelWriter(output, engine='xlsxwriter', datetime_format='dd/mm/yyyy') as writer:
                     df_export.to_excel(writer, sheet_name='Salarios_Contribuicao', index=False)
                     
                     workbook = writer.book
                     worksheet = writer.sheets['Salarios_Contribuicao']
                     
-                    # 2. **NOVO AJUSTE:** Formatar explicitamente a coluna de Competência se for uma Data Completa.
-                    if coluna_data_selecionada == "Data" and 'Competencia' in df_export.columns:
-                        data_col_idx = df_export.columns.get_loc('Competencia')
-                        # Formato nativo do Excel para data/hora no padrão DD/MM/AAAA.
-                        date_excel_format = 'dd/mm/yyyy' 
-                        
-                        # Loop para aplicar o formato a todas as células da coluna (excluindo o cabeçalho)
-                        # O índice da coluna no openpyxl é baseado em 1, por isso + 1
-                        for row in range(2, len(df_export) + 2):
-                            worksheet.cell(row=row, column=data_col_idx + 1).number_format = date_excel_format
-                            
-                    # 3. Formatar coluna de salário como moeda brasileira (melhorando o formato)
+                    # Formatar coluna de salário como moeda brasileira
                     if 'Salario_Contribuicao' in df_export.columns:
                         salario_col_idx = df_export.columns.get_loc('Salario_Contribuicao')
-                        # Formato de moeda brasileiro no Excel
-                        moeda_excel_format = 'R$ #,##0.00'
-                        for row in range(2, len(df_export) + 2):
-                            worksheet.cell(row=row, column=salario_col_idx + 1).number_format = moeda_excel_format
+                        moeda_excel_format = workbook.add_format({'num_format': 'R$ #,##0.00'})
+                        worksheet.set_column(salario_col_idx, salario_col_idx, None, moeda_excel_format)
                     
                 excel_data = output.getvalue()
                 
@@ -1,9 +1,10 @@
 import streamlit as st
 import pandas as pd
-import pdfplumber
 import re
+import locale
 from datetime import datetime, timedelta
 import io
+import os
 import json
 import pickle
 from pathlib import Path
@@ -13,10 +14,65 @@ import plotly.express as px
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 
+from leitura_pdf import extrair_textos
+
+# Hash de DataFrames para st.cache_data: conteúdo completo, não amostrado; nomes e tipos
+# das colunas entram na chave (os valores sozinhos não distinguem colunas renomeadas/convertidas)
+_HASH_DATAFRAME = {
+    pd.DataFrame: lambda d: (
+        d.shape,
+        tuple(d.columns),
+        tuple(map(str, d.dtypes)),
+        pd.util.hash_pandas_object(d, index=False).values.tobytes()
+    )
+}
+
+# Padrões compilados uma única vez (usados por página/linha/célula)
+_RE_NAO_NUMERICO = re.compile(r'[^\d,\.]')
+_RE_DECIMAL_SIMPLES = re.compile(r'^\d+,\d{1,2}$')
+_RE_DECIMAL_MILHAR = re.compile(r'^\d{1,3}(?:\.\d{3})*,\d{2}$')
+_RE_NUMERO_BR = re.compile(r'(\d{1,3}(?:\.\d{3})*,\d{2})')
+_RE_ANO_REFERENCIA = re.compile(r'ANO\s+REFER[EÊ]NCIA\s*[:\s]*(\d{4})\b', re.IGNORECASE)
+_RE_ANO = re.compile(r'\b(\d{4})\b')
+
+def set_brazilian_locale():
+    try:
+        locale.setlocale(locale.LC_NUMERIC, 'pt_BR.UTF-8')
+        return True
+    except locale.Error:
+        try:
+            locale.setlocale(locale.LC_NUMERIC, 'pt_BR.utf8')
+            return True
+        except locale.Error:
+            return False
+br_locale_ok = set_brazilian_locale()
+
+# Sem locale pt_BR: troca ',' <-> '.' numa única passada sobre o texto
+_TROCA_SEPARADORES = str.maketrans(',.', '.,')
+
 # ============================================
 # MÓDULO 1: CONFIGURAÇÕES E PREFERÊNCIAS
 # ============================================
 
+def _mtime_arquivo(caminho: str) -> Optional[float]:
+    """Data de modificação do arquivo (None se não existir), usada como chave de cache"""
+    try:
+        return os.path.getmtime(caminho)
+    except OSError:
+        return None
+
+@st.cache_data(show_spinner=False)
+def _ler_json_cached(caminho: str, mtime: Optional[float]) -> Dict:
+    """Lê um JSON do disco; relido apenas quando o arquivo muda"""
+    with open(caminho, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+@st.cache_data(show_spinner=False)
+def _ler_pickle_cached(caminho: str, mtime: Optional[float]):
+    """Lê um pickle do disco; relido apenas quando o arquivo muda"""
+    with open(caminho, 'rb') as f:
+        return pickle.load(f)
+
 class ConfiguradorUsuario:
     """Gerencia as configurações e preferências do usuário"""
     
@@ -29,6 +85,7 @@ class ConfiguradorUsuario:
         try:
             with open(self.config_file, 'w', encoding='utf-8') as f:
                 json.dump(config, f, ensure_ascii=False, indent=2)
+            _ler_json_cached.clear()
             return True
         except:
             return False
@@ -36,8 +93,7 @@ class ConfiguradorUsuario:
     def carregar_configuracao(self) -> Dict:
         """Carrega configurações do usuário"""
         try:
-            with open(self.config_file, 'r', encoding='utf-8') as f:
-                return json.load(f)
+            return _ler_json_cached(self.config_file, _mtime_arquivo(self.config_file))
         except:
             return {
                 'extrair_proventos': True,
@@ -53,6 +109,7 @@ class ConfiguradorUsuario:
         try:
             with open(self.rubricas_favoritas_file, 'wb') as f:
                 pickle.dump(rubricas, f)
+            _ler_pickle_cached.clear()
             return True
         except:
             return False
@@ -60,8 +117,7 @@ class ConfiguradorUsuario:
     def carregar_rubricas_favoritas(self) -> List[str]:
         """Carrega rubricas favoritas do usuário"""
         try:
-            with open(self.rubricas_favoritas_file, 'rb') as f:
-                return pickle.load(f)
+            return _ler_pickle_cached(self.rubricas_favoritas_file, _mtime_arquivo(self.rubricas_favoritas_file))
         except:
             return []
     
@@ -158,10 +214,7 @@ class CorrecaoMonetaria:
         df_corrigido = df.copy()
         
         # Converte valores para numérico
-        extrator = ExtratorDemonstrativos()
-        df_corrigido['Valor_Numerico'] = df_corrigido['Valor'].apply(
-            lambda x: extrator.converter_valor_string(x) or 0
-        )
+        df_corrigido['Valor_Numerico'] = ExtratorDemonstrativos.valores_numericos(df_corrigido)
         
         # Aplica correção
         df_corrigido['Valor_Corrigido'] = df_corrigido.apply(
@@ -175,12 +228,15 @@ class CorrecaoMonetaria:
         )
         
         # Formata valores corrigidos
-        df_corrigido['Valor_Corrigido_Formatado'] = df_corrigido['Valor_Corrigido'].apply(
-            lambda x: f"{x:,.2f}".replace(',', 'X').replace('.', ',').replace('X', '.')
-        )
+        df_corrigido['Valor_Corrigido_Formatado'] = df_corrigido['Valor_Corrigido'].map(formatar_valor_brasileiro)
         
         return df_corrigido
 
+@st.cache_data(show_spinner=False, hash_funcs=_HASH_DATAFRAME)
+def _aplicar_correcao_cached(df: pd.DataFrame, data_correcao: str, indice: str) -> pd.DataFrame:
+    """Aplica a correção monetária com cache entre reruns do Streamlit"""
+    return CorrecaoMonetaria().aplicar_correcao_dataframe(df, data_correcao, indice)
+
 # ============================================
 # MÓDULO 3: ANÁLISE COMPARATIVA
 # ============================================
@@ -196,23 +252,20 @@ class AnalisadorComparativo:
         if df.empty:
             return pd.DataFrame()
         
-        # Converte valores para numérico
-        extrator = ExtratorDemonstrativos()
-        df_numeric = df.copy()
-        df_numeric['Valor_Numerico'] = df_numeric['Valor'].apply(
-            lambda x: extrator.converter_valor_string(x) or 0
-        )
-        
-        # Filtra pela rubrica
-        df_rubrica = df_numeric[df_numeric['Discriminacao'] == rubrica].copy()
+        # Filtra pela rubrica (copia só o recorte, não o DataFrame inteiro)
+        df_rubrica = df[df['Discriminacao'] == rubrica].copy()
         
         if df_rubrica.empty:
             return pd.DataFrame()
         
+        # Converte valores para numérico
+        df_rubrica['Valor_Numerico'] = ExtratorDemonstrativos.valores_numericos(df_rubrica)
+        
         # Agrupa por ano e mês
         try:
-            df_rubrica['Mes'] = df_rubrica['Competencia'].apply(lambda x: int(x.split('/')[0]))
-            df_rubrica['Ano'] = df_rubrica['Competencia'].apply(lambda x: int(x.split('/')[1]))
+            mes_ano = df_rubrica['Competencia'].astype(str).str.split('/', n=1, expand=True).astype(int)
+            df_rubrica['Mes'] = mes_ano[0]
+            df_rubrica['Ano'] = mes_ano[1]
         except:
             return pd.DataFrame()
         
@@ -250,36 +303,45 @@ class AnalisadorComparativo:
         """
         Analisa composição dos descontos em um ano específico
         """
+        return AnalisadorComparativo.composicao_todos_anos(df).get(int(ano), {})
+    
+    @staticmethod
+    @st.cache_data(show_spinner=False, hash_funcs=_HASH_DATAFRAME)
+    def composicao_todos_anos(df: pd.DataFrame) -> Dict[int, Dict]:
+        """
+        Composição dos descontos de todos os anos, com um único agrupamento por (Ano, rubrica)
+        """
         if df.empty:
             return {}
         
-        df_ano = df[(df['Ano'] == str(ano)) & (df['Tipo'] == 'DESCONTO')].copy()
+        df_descontos = df[df['Tipo'] == 'DESCONTO']
         
-        if df_ano.empty:
+        if df_descontos.empty:
             return {}
         
-        # Converte valores
-        extrator = ExtratorDemonstrativos()
-        df_ano['Valor_Numerico'] = df_ano['Valor'].apply(
-            lambda x: extrator.converter_valor_string(x) or 0
-        )
-        
-        # Agrupa por rubrica
-        composicao = df_ano.groupby('Discriminacao')['Valor_Numerico'].sum().sort_values(ascending=False)
+        # Converte valores e agrupa por ano e rubrica de uma só vez
+        valores = ExtratorDemonstrativos.valores_numericos(df_descontos)
+        somas = valores.groupby([df_descontos['Ano'], df_descontos['Discriminacao']], observed=True).sum()
         
-        # Calcula percentuais
-        total = composicao.sum()
-        if total > 0:
-            percentuais = (composicao / total * 100).round(2)
-        else:
-            percentuais = composicao * 0
+        resultado = {}
+        for ano, composicao in somas.groupby(level=0):
+            composicao = composicao.droplevel(0).sort_values(ascending=False)
+            
+            # Calcula percentuais
+            total = composicao.sum()
+            if total > 0:
+                percentuais = (composicao / total * 100).round(2)
+            else:
+                percentuais = composicao * 0
+            
+            resultado[int(ano)] = {
+                'composicao': composicao.to_dict(),
+                'percentuais': percentuais.to_dict(),
+                'total_ano': total,
+                'top_5': composicao.head(5).to_dict()
+            }
         
-        return {
-            'composicao': composicao.to_dict(),
-            'percentuais': percentuais.to_dict(),
-            'total_ano': total,
-            'top_5': composicao.head(5).to_dict()
-        }
+        return resultado
 
 # ============================================
 # MÓDULO 4: ANÁLISE POR SEMESTRE
@@ -305,26 +367,24 @@ class AnalisadorSemestral:
         df_analise = df.copy()
         
         # Converte valores para numérico
-        extrator = ExtratorDemonstrativos()
-        df_analise['Valor_Numerico'] = df_analise['Valor'].apply(
-            lambda x: extrator.converter_valor_string(x) or 0
-        )
+        df_analise['Valor_Numerico'] = ExtratorDemonstrativos.valores_numericos(df_analise)
         
         # Extrai mês e ano da competência
         try:
-            df_analise['Mes'] = df_analise['Competencia'].apply(lambda x: int(x.split('/')[0]))
-            df_analise['Ano'] = df_analise['Competencia'].apply(lambda x: int(x.split('/')[1]))
+            mes_ano = df_analise['Competencia'].astype(str).str.split('/', n=1, expand=True).astype(int)
+            df_analise['Mes'] = mes_ano[0]
+            df_analise['Ano'] = mes_ano[1]
         except:
             return pd.DataFrame()
         
-        # Determina o semestre
-        df_analise['Semestre'] = df_analise['Mes'].apply(AnalisadorSemestral.calcular_semestre)
-        df_analise['Semestre_Label'] = df_analise.apply(
-            lambda row: f"{row['Ano']} - {row['Semestre']}º Sem", axis=1
+        # Determina o semestre (mesma regra de calcular_semestre, sobre a coluna inteira)
+        df_analise['Semestre'] = np.where(df_analise['Mes'] <= 6, 1, 2)
+        df_analise['Semestre_Label'] = (
+            df_analise['Ano'].astype(str) + ' - ' + df_analise['Semestre'].astype(str) + 'º Sem'
         )
         
         # Agrupa por semestre e tipo
-        semestral_tipo = df_analise.groupby(['Ano', 'Semestre', 'Semestre_Label', 'Tipo'])['Valor_Numerico'].sum().reset_index()
+        semestral_tipo = df_analise.groupby(['Ano', 'Semestre', 'Semestre_Label', 'Tipo'], observed=True)['Valor_Numerico'].sum().reset_index()
         
         # Pivot para ter tipos como colunas
         if not semestral_tipo.empty:
@@ -333,7 +393,8 @@ class AnalisadorSemestral:
                 index=['Ano', 'Semestre', 'Semestre_Label'],
                 columns='Tipo',
                 aggfunc='sum',
-                fill_value=0
+                fill_value=0,
+                observed=True
             ).reset_index()
             
             # Calcula saldo líquido (RENDIMENTO - DESCONTO) se ambas colunas existirem
@@ -346,9 +407,7 @@ class AnalisadorSemestral:
             # Formata valores para colunas existentes
             for col in ['RENDIMENTO', 'DESCONTO', 'LIQUIDO']:
                 if col in pivot_semestral.columns:
-                    pivot_semestral[f'{col}_Formatado'] = pivot_semestral[col].apply(
-                        lambda x: f"{x:,.2f}".replace(',', 'X').replace('.', ',').replace('X', '.')
-                    )
+                    pivot_semestral[f'{col}_Formatado'] = pivot_semestral[col].map(formatar_valor_brasileiro)
             
             return pivot_semestral
         else:
@@ -365,20 +424,18 @@ class AnalisadorSemestral:
         df_analise = df.copy()
         
         # Converte valores para numérico
-        extrator = ExtratorDemonstrativos()
-        df_analise['Valor_Numerico'] = df_analise['Valor'].apply(
-            lambda x: extrator.converter_valor_string(x) or 0
-        )
+        df_analise['Valor_Numerico'] = ExtratorDemonstrativos.valores_numericos(df_analise)
         
         # Extrai mês e ano
         try:
-            df_analise['Mes'] = df_analise['Competencia'].apply(lambda x: int(x.split('/')[0]))
-            df_analise['Ano'] = df_analise['Competencia'].apply(lambda x: int(x.split('/')[1]))
+            mes_ano = df_analise['Competencia'].astype(str).str.split('/', n=1, expand=True).astype(int)
+            df_analise['Mes'] = mes_ano[0]
+            df_analise['Ano'] = mes_ano[1]
         except:
             return {}
         
         # Determina semestre
-        df_analise['Semestre'] = df_analise['Mes'].apply(AnalisadorSemestral.calcular_semestre)
+        df_analise['Semestre'] = np.where(df_analise['Mes'] <= 6, 1, 2)
         
         # Análise de descontos por semestre
         descontos_semestrais = {}
@@ -394,7 +451,7 @@ class AnalisadorSemestral:
                 
                 if not df_semestre.empty:
                     # Top descontos do semestre
-                    top_descontos = df_semestre.groupby('Discriminacao')['Valor_Numerico'].sum().nlargest(top_n)
+                    top_descontos = df_semestre.groupby('Discriminacao', observed=True)['Valor_Numerico'].sum().nlargest(top_n)
                     
                     descontos_semestrais[f"{ano}-S{semestre}"] = {
                         'total': df_semestre['Valor_Numerico'].sum(),
@@ -415,7 +472,7 @@ class AnalisadorSemestral:
                 
                 if not df_semestre.empty:
                     # Top rendimentos do semestre
-                    top_rendimentos = df_semestre.groupby('Discriminacao')['Valor_Numerico'].sum().nlargest(top_n)
+                    top_rendimentos = df_semestre.groupby('Discriminacao', observed=True)['Valor_Numerico'].sum().nlargest(top_n)
                     
                     rendimentos_semestrais[f"{ano}-S{semestre}"] = {
                         'total': df_semestre['Valor_Numerico'].sum(),
@@ -472,21 +529,19 @@ class TemplateRelatorios:
             return df
         
         template = self.templates[template_id]
-        df_resultado = df.copy()
         
-        # Aplica filtros padrão
+        # Filtros padrão combinados numa única máscara
+        mascara = np.ones(len(df), dtype=bool)
         for coluna, valores in template.get('filtros_padrao', {}).items():
-            if coluna in df_resultado.columns and valores:
-                df_resultado = df_resultado[df_resultado[coluna].isin(valores)]
+            if coluna in df.columns and valores:
+                mascara &= df[coluna].isin(valores).to_numpy()
         
         # Seleciona colunas
         colunas_template = template.get('colunas', [])
-        colunas_disponiveis = [c for c in colunas_template if c in df_resultado.columns]
-        
-        if colunas_disponiveis:
-            df_resultado = df_resultado[colunas_disponiveis]
+        colunas_disponiveis = [c for c in colunas_template if c in df.columns]
         
-        return df_resultado
+        # Um único recorte (linhas e colunas), que já devolve uma cópia
+        return df.loc[mascara, colunas_disponiveis or df.columns]
 
 # ============================================
 # MÓDULO PRINCIPAL CORRIGIDO (EXTRATOR)
@@ -512,25 +567,45 @@ class ExtratorDemonstrativos:
         }
         self.meses_ordenados = ["JAN", "FEV", "MAR", "ABR", "MAI", "JUN", "JUL", "AGO", "SET", "OUT", "NOV", "DEZ"]
     
-    def formatar_valor_brasileiro(self, valor: float) -> str:
+    @staticmethod
+    def formatar_valor_brasileiro(valor: float) -> str:
         """Formata valor float para string no padrão brasileiro 1.234,56"""
-        return f"{valor:,.2f}".replace(',', 'X').replace('.', ',').replace('X', '.')
+        return formatar_valor_brasileiro(valor)
     
-    def converter_valor_string(self, valor_str: str) -> Optional[float]:
+    @staticmethod
+    def converter_valor_string(valor_str: str) -> Optional[float]:
         """Converte string de valor brasileiro para float"""
         try:
-            valor_str = re.sub(r'[^\d,\.]', '', str(valor_str))
+            valor_str = _RE_NAO_NUMERICO.sub('', str(valor_str))
             
-            if re.match(r'^\d+,\d{1,2}$', valor_str):
+            if _RE_DECIMAL_SIMPLES.match(valor_str):
                 return float(valor_str.replace('.', '').replace(',', '.'))
             
-            if re.match(r'^\d{1,3}(?:\.\d{3})*,\d{2}$', valor_str):
+            if _RE_DECIMAL_MILHAR.match(valor_str):
                 return float(valor_str.replace('.', '').replace(',', '.'))
             
             return float(valor_str.replace(',', '.'))
         except:
             return None
     
+    @staticmethod
+    def converter_valor_series(valores: pd.Series) -> pd.Series:
+        """Converte uma Series de valores brasileiros para float de forma vetorizada"""
+        limpos = (
+            valores.astype(str)
+            .str.replace(_RE_NAO_NUMERICO, '', regex=True)
+            .str.replace('.', '', regex=False)
+            .str.replace(',', '.', regex=False)
+        )
+        return pd.to_numeric(limpos, errors='coerce').fillna(0.0)
+    
+    @staticmethod
+    def valores_numericos(df: pd.DataFrame) -> pd.Series:
+        """Retorna os valores numéricos do DataFrame, reaproveitando Valor_float quando existir"""
+        if 'Valor_float' in df.columns:
+            return df['Valor_float']
+        return ExtratorDemonstrativos.converter_valor_series(df['Valor'])
+    
     def extrair_ano_referencia_robusto(self, texto: str, pagina_num: int) -> Optional[str]:
         """Extrai o ano de referência do texto do demonstrativo"""
         if not texto:
@@ -541,162 +616,199 @@ class ExtratorDemonstrativos:
         for i, linha in enumerate(linhas):
             linha_limpa = linha.strip()
             
-            padrao_exato = re.search(r'ANO\s+REFER[EÊ]NCIA\s*[:\s]*(\d{4})\b', linha_limpa, re.IGNORECASE)
+            padrao_exato = _RE_ANO_REFERENCIA.search(linha_limpa)
             if padrao_exato:
                 return padrao_exato.group(1)
             
             if 'ANO REFER' in linha_limpa.upper():
                 if i + 1 < len(linhas):
                     prox_linha = linhas[i + 1].strip()
-                    ano_match = re.search(r'\b(\d{4})\b', prox_linha)
+                    ano_match = _RE_ANO.search(prox_linha)
                     if ano_match:
                         return ano_match.group(1)
         
         return None
     
+    def extrair_textos_pdf(self, pdf_file) -> List[str]:
+        """Extrai o texto de todas as páginas (vazio nas que não são demonstrativos)"""
+        if isinstance(pdf_file, (str, Path)):
+            pdf_bytes = Path(pdf_file).read_bytes()
+        else:
+            pdf_file.seek(0)
+            pdf_bytes = pdf_file.read()
+        return extrair_textos(pdf_bytes, termo='DEMONSTRATIVO')
+    
     def processar_pdf(self, pdf_file, extrair_proventos: bool = True, extrair_descontos: bool = True) -> pd.DataFrame:
         """Processa o PDF e extrai dados - CORREÇÃO BASEADA EM TEXTO"""
-        dados = []
+        # Uma lista por coluna: o DataFrame é montado de uma vez, sem inferir chaves linha a linha
+        dados = {coluna: [] for coluna in ('Discriminacao', 'Valor', 'Valor_float', 'Competencia', 'Pagina', 'Ano', 'Tipo')}
+        
+        secoes_extraidas = set()
+        if extrair_proventos:
+            secoes_extraidas.add("RENDIMENTO")
+        if extrair_descontos:
+            secoes_extraidas.add("DESCONTO")
+        if not secoes_extraidas:
+            return pd.DataFrame(columns=list(dados))
         
-        with pdfplumber.open(pdf_file) as pdf:
-            ultimo_semestre = None
-            secao_atual = None
+        # O texto de todas as páginas é extraído antes; a leitura das linhas continua sequencial,
+        # pois o semestre e a seção atuais passam de uma página para a seguinte
+        textos = self.extrair_textos_pdf(pdf_file)
+        ultimo_semestre = None
+        secao_atual = None
+        
+        for pagina_num, texto in enumerate(textos, 1):
+            if not texto:
+                continue
+            # Página convertida para maiúsculas uma única vez (e não linha a linha)
+            texto_upper = texto.upper()
+            if 'DEMONSTRATIVO' not in texto_upper:
+                continue
             
-            for pagina_num, pagina in enumerate(pdf.pages, 1):
-                texto = pagina.extract_text()
-                if not texto or 'DEMONSTRATIVO' not in texto.upper():
-                    continue
-                
-                ano = self.extrair_ano_referencia_robusto(texto, pagina_num)
-                if not ano:
+            ano = self.extrair_ano_referencia_robusto(texto, pagina_num)
+            if not ano:
+                continue
+            
+            linhas = texto.split('\n')
+            linhas_upper = texto_upper.split('\n')
+            cabecalho_idx = None
+            meses_pagina = []
+            
+            # Identificar linha de cabeçalho com meses
+            for i, linha_upper in enumerate(linhas_upper):
+                count_meses = sum(1 for m in self.meses_ordenados if m in linha_upper)
+                if count_meses >= 3 or "TIPODISCRIMINAÇÃO" in linha_upper:
+                    cabecalho_idx = i
+                    # Determinar quais meses estão presentes (primeiro ou segundo semestre)
+                    if "JAN" in linha_upper:
+                        meses_pagina = ["JAN", "FEV", "MAR", "ABR", "MAI", "JUN"]
+                    elif "JUL" in linha_upper:
+                        meses_pagina = ["JUL", "AGO", "SET", "OUT", "NOV", "DEZ"]
+                    else:
+                        # Fallback: extrair na ordem de aparecimento
+                        encontrados = []
+                        pos = 0
+                        while pos < len(linha_upper):
+                            match = None
+                            for m in self.meses_ordenados:
+                                if linha_upper.startswith(m, pos):
+                                    encontrados.append(m)
+                                    pos += len(m)
+                                    match = m
+                                    break
+                            if not match:
+                                pos += 1
+                        meses_pagina = encontrados[:6]  # pegar os 6 primeiros encontrados
+                    break
+            
+            if cabecalho_idx is None or not meses_pagina:
+                continue  # página sem cabeçalho identificável
+            
+            # Se o semestre mudou, reinicia a seção atual
+            if meses_pagina != ultimo_semestre:
+                secao_atual = None
+                ultimo_semestre = meses_pagina
+            
+            # Processar linhas após o cabeçalho
+            for linha, linha_upper in zip(linhas[cabecalho_idx+1:], linhas_upper[cabecalho_idx+1:]):
+                linha = linha.strip()
+                if not linha:
                     continue
                 
-                linhas = texto.split('\n')
-                cabecalho_idx = None
-                meses_pagina = []
-                
-                # Identificar linha de cabeçalho com meses
-                for i, linha in enumerate(linhas):
-                    linha_upper = linha.upper()
-                    count_meses = sum(1 for m in self.meses_ordenados if m in linha_upper)
-                    if count_meses >= 3 or "TIPODISCRIMINAÇÃO" in linha_upper:
-                        cabecalho_idx = i
-                        # Determinar quais meses estão presentes (primeiro ou segundo semestre)
-                        if "JAN" in linha_upper:
-                            meses_pagina = ["JAN", "FEV", "MAR", "ABR", "MAI", "JUN"]
-                        elif "JUL" in linha_upper:
-                            meses_pagina = ["JUL", "AGO", "SET", "OUT", "NOV", "DEZ"]
-                        else:
-                            # Fallback: extrair na ordem de aparecimento
-                            encontrados = []
-                            pos = 0
-                            while pos < len(linha_upper):
-                                match = None
-                                for m in self.meses_ordenados:
-                                    if linha_upper.startswith(m, pos):
-                                        encontrados.append(m)
-                                        pos += len(m)
-                                        match = m
-                                        break
-                                if not match:
-                                    pos += 1
-                            meses_pagina = encontrados[:6]  # pegar os 6 primeiros encontrados
-                        break
-                
-                if cabecalho_idx is None or not meses_pagina:
-                    continue  # página sem cabeçalho identificável
+                linha_upper = linha_upper.strip()
                 
-                # Se o semestre mudou, reinicia a seção atual
-                if meses_pagina != ultimo_semestre:
-                    secao_atual = None
-                    ultimo_semestre = meses_pagina
+                # Detectar início de seção (registrada mesmo se desmarcada, para que
+                # suas linhas não sejam atribuídas à seção anterior)
+                if linha_upper.startswith("RENDIMENTOS"):
+                    secao_atual = "RENDIMENTO"
+                    linha = linha[len("RENDIMENTOS"):].strip()
+                elif linha_upper.startswith("DESCONTOS"):
+                    secao_atual = "DESCONTO"
+                    linha = linha[len("DESCONTOS"):].strip()
                 
-                # Processar linhas após o cabeçalho
-                for linha in linhas[cabecalho_idx+1:]:
-                    linha = linha.strip()
-                    if not linha:
-                        continue
-                    
-                    linha_upper = linha.upper()
-                    
-                    # Detectar início de seção
-                    if linha_upper.startswith("RENDIMENTOS"):
-                        if extrair_proventos:
-                            secao_atual = "RENDIMENTO"
-                            resto = linha[len("RENDIMENTOS"):].strip()
-                            if resto:
-                                self._processar_linha_rubrica(resto, secao_atual, meses_pagina, ano, pagina_num, dados)
-                    elif linha_upper.startswith("DESCONTOS"):
-                        if extrair_descontos:
-                            secao_atual = "DESCONTO"
-                            resto = linha[len("DESCONTOS"):].strip()
-                            if resto:
-                                self._processar_linha_rubrica(resto, secao_atual, meses_pagina, ano, pagina_num, dados)
-                    elif secao_atual:
-                        # Linha comum da seção atual
-                        self._processar_linha_rubrica(linha, secao_atual, meses_pagina, ano, pagina_num, dados)
-        
-        if not dados:
-            return pd.DataFrame(columns=['Discriminacao', 'Valor', 'Competencia', 'Pagina', 'Ano', 'Tipo'])
+                # Seções desmarcadas são descartadas antes de qualquer leitura de valores
+                if linha and secao_atual in secoes_extraidas:
+                    self._processar_linha_rubrica(linha, secao_atual, meses_pagina, ano, pagina_num, dados)
+    
+        if not dados['Valor']:
+            return pd.DataFrame(columns=list(dados))
         
+        # Valores já validados por _RE_NUMERO_BR ("1.234,56"): a coluna inteira é convertida de uma vez
+        dados['Valor_float'] = (
+            pd.Series(dados['Valor'], dtype=str)
+            .str.replace('.', '', regex=False)
+            .str.replace(',', '.', regex=False)
+            .astype('float64')
+            .to_numpy()
+        )
+        dados['Pagina'] = np.asarray(dados['Pagina'], dtype=np.int16)
+        dados['Ano'] = np.asarray(dados['Ano'], dtype=np.int16)
         df = pd.DataFrame(dados)
         
         # Remover registros com valor zero (opcional)
-        df = df[df['Valor'] != '0,00']
+        df = df[df['Valor_float'] != 0]
         
         # Adicionar numeração sequencial para rubricas com mesmo nome e mesma competência
-        df['Sequencia'] = df.groupby(['Discriminacao', 'Competencia', 'Tipo']).cumcount() + 1
-        df['Discriminacao_Original'] = df['Discriminacao']
-        
-        # Contar quantas vezes cada rubrica aparece na mesma competência
-        contagens = df.groupby(['Discriminacao_Original', 'Competencia', 'Tipo']).size().reset_index(name='Contagem')
-        df = df.merge(contagens, on=['Discriminacao_Original', 'Competencia', 'Tipo'], how='left')
-        
-        df['Discriminacao'] = df.apply(
-            lambda row: f"{row['Discriminacao_Original']} #{row['Sequencia']}"
-            if row['Contagem'] > 1 else row['Discriminacao_Original'],
-            axis=1
+        grupos = df.groupby(['Discriminacao', 'Competencia', 'Tipo'], sort=False)
+        sequencia = grupos.cumcount() + 1
+        contagem = grupos['Discriminacao'].transform('size')
+
+        # Só numera (#1, #2, ...) quando a rubrica se repete na mesma competência
+        df['Discriminacao'] = np.where(
+            contagem > 1,
+            df['Discriminacao'] + ' #' + sequencia.astype(str),
+            df['Discriminacao']
         )
         
         # Selecionar colunas finais e ordenar
-        df = df[['Discriminacao', 'Valor', 'Competencia', 'Pagina', 'Ano', 'Tipo']]
+        df = df[['Discriminacao', 'Valor', 'Valor_float', 'Competencia', 'Pagina', 'Ano', 'Tipo']]
+        df = df.astype({
+            'Discriminacao': 'category',
+            'Competencia': 'category',
+            'Tipo': 'category'
+        })
         df = df.sort_values(['Ano', 'Pagina', 'Tipo', 'Discriminacao', 'Competencia']).reset_index(drop=True)
         return df
     
     def _processar_linha_rubrica(self, linha, secao, meses, ano, pagina, dados):
         """Processa uma linha de rubrica, extrai valores e adiciona aos dados."""
-        # Padrão para números no formato brasileiro: 1.234,56 ou 0,00
-        padrao_num = r'(\d{1,3}(?:\.\d{3})*,\d{2})'
-        numeros = re.findall(padrao_num, linha)
+        # Números no formato brasileiro: 1.234,56 ou 0,00 (uma única varredura da linha)
+        ocorrencias = list(_RE_NUMERO_BR.finditer(linha))
+        numeros = [m.group(1) for m in ocorrencias]
         
         if len(numeros) < len(meses):
             return  # não há números suficientes (linha provavelmente não é de rubrica)
         
-        # Encontrar a posição do primeiro número para separar o nome da rubrica
-        primeiro_num = re.search(padrao_num, linha)
-        if not primeiro_num:
+        # A posição do primeiro número separa o nome da rubrica
+        if not ocorrencias:
             return
-        nome_rubrica = linha[:primeiro_num.start()].strip()
-        
-        # Para cada mês, associar o valor correspondente
-        for i, mes_abbr in enumerate(meses):
-            if i >= len(numeros):
-                break
-            valor_str = numeros[i]
-            valor_float = self.converter_valor_string(valor_str)
-            if valor_float is not None and valor_float != 0:
-                mes_num = self.meses_map.get(mes_abbr)
-                if mes_num is None:
-                    continue
-                competencia = f"{mes_num:02d}/{ano}"
-                dados.append({
-                    'Discriminacao': nome_rubrica,
-                    'Valor': valor_str,
-                    'Competencia': competencia,
-                    'Pagina': pagina,
-                    'Ano': ano,
-                    'Tipo': secao
-                })
+        nome_rubrica = linha[:ocorrencias[0].start()].strip()
+        
+        # Para cada mês, associar o valor correspondente (a conversão para float
+        # é feita em lote no final de processar_pdf)
+        for mes_abbr, valor_str in zip(meses, numeros):
+            if valor_str == '0,00':
+                continue
+            mes_num = self.meses_map.get(mes_abbr)
+            if mes_num is None:
+                continue
+            competencia = f"{mes_num:02d}/{ano}"
+            dados['Discriminacao'].append(nome_rubrica)
+            dados['Valor'].append(valor_str)
+            dados['Competencia'].append(competencia)
+            dados['Pagina'].append(pagina)
+            dados['Ano'].append(int(ano))
+            dados['Tipo'].append(secao)
+
+@st.cache_data(show_spinner=False)
+def _processar_pdf_cached(file_bytes: bytes, extrair_proventos: bool, extrair_descontos: bool) -> pd.DataFrame:
+    """Processa o PDF com cache entre reruns (chave: conteúdo do arquivo + opções de extração)"""
+    extrator = ExtratorDemonstrativos()
+    return extrator.processar_pdf(
+        io.BytesIO(file_bytes),
+        extrair_proventos=extrair_proventos,
+        extrair_descontos=extrair_descontos
+    )
 
 # ============================================
 # INTERFACE STREAMLIT (INALTERADA)
@@ -735,40 +847,484 @@ def formatar_valor_total(df):
     if df.empty:
         return "R$ 0,00"
     
-    extrator = ExtratorDemonstrativos()
-    valores = df['Valor'].apply(lambda x: extrator.converter_valor_string(x) or 0)
-    total = valores.sum()
-    return f"R$ {total:,.2f}".replace(',', 'X').replace('.', ',').replace('X', '.')
+    return f"R$ {formatar_valor_brasileiro(ExtratorDemonstrativos.valores_numericos(df).sum())}"
+
+def analise_semestral_sessao(df: pd.DataFrame) -> pd.DataFrame:
+    """Consolidado semestral do DataFrame atual, calculado uma vez e reaproveitado entre abas"""
+    # Compara pelo próprio objeto (não por id), pois a referência fica guardada na sessão
+    if st.session_state.get('analise_semestral_base') is not df:
+        st.session_state.analise_semestral = st.session_state.analisador_semestral.analisar_por_semestre(df)
+        st.session_state.analise_semestral_base = df
+    return st.session_state.analise_semestral
+
+def opcoes_unicas(serie: pd.Series) -> List:
+    """Valores distintos e ordenados de uma coluna (categorias presentes, se categórica)"""
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        return sorted(serie.cat.remove_unused_categories().cat.categories)
+    return sorted(serie.unique())
+
+def contar_rubricas_numeradas(serie: pd.Series) -> int:
+    """Linhas com rubrica numerada (#1, #2...); se categórica, testa só as categorias"""
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        categorias = serie.cat.categories
+        return int(serie.isin(categorias[categorias.str.contains('#', regex=False)]).sum())
+    return int(serie.str.contains('#', regex=False).sum())
 
 def formatar_valor_brasileiro(valor):
     """Formata valor para padrão brasileiro"""
-    return f"{valor:,.2f}".replace(',', 'X').replace('.', ',').replace('X', '.')
+    if br_locale_ok:
+        return locale.format_string('%.2f', valor, grouping=True)
+    return f"{valor:,.2f}".translate(_TROCA_SEPARADORES)
+
+@st.cache_data(show_spinner=False, max_entries=8, hash_funcs=_HASH_DATAFRAME)
+def _exportar_bytes_cached(df: pd.DataFrame, formato: str) -> bytes:
+    """Arquivo de exportação gerado uma vez por conteúdo/formato; reruns reutilizam o resultado"""
+    buffer = io.BytesIO()
+    if formato == "Excel (XLSX)":
+        with pd.ExcelWriter(buffer, engine='xlsxwriter') as writer:
+            df.to_excel(writer, index=False, sheet_name='Dados')
+    else:
+        # Escrito direto em bytes (com o BOM do utf-8-sig), sem montar a string inteira antes
+        df.to_csv(buffer, index=False, sep=';', encoding='utf-8-sig')
+    return buffer.getvalue()
 
 def exportar_dados(df, formato, nome_arquivo):
     """Exporta dados no formato selecionado"""
     timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
     
     if formato == "Excel (XLSX)":
-        buffer = io.BytesIO()
-        with pd.ExcelWriter(buffer, engine='openpyxl') as writer:
-            df.to_excel(writer, index=False, sheet_name='Dados')
-        buffer.seek(0)
         st.download_button(
             label="⬇️ Baixar Excel",
-            data=buffer,
+            data=_exportar_bytes_cached(df, formato),
             file_name=f"demonstrativos_{timestamp}.xlsx",
             mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
         )
     
     elif formato == "CSV":
-        csv = df.to_csv(index=False, sep=';', encoding='utf-8-sig')
         st.download_button(
             label="⬇️ Baixar CSV",
-            data=csv,
+            data=_exportar_bytes_cached(df, formato),
             file_name=f"demonstrativos_{timestamp}.csv",
             mime="text/csv"
         )
 
+@st.fragment
+def _aba_dashboard(df):
+    """Aba Dashboard: métricas gerais e prévia dos dados"""
+    # Estatísticas rápidas
+    st.subheader("📊 Visão Geral")
+    
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st.metric("Total Registros", len(df))
+    with col2:
+        st.metric("Anos", df['Ano'].nunique())
+    with col3:
+        st.metric("Rubricas Únicas", df['Discriminacao'].nunique())
+    with col4:
+        st.metric("Valor Total", formatar_valor_total(df))
+    
+    # Verificação de rubricas duplicadas
+    n_duplicatas = contar_rubricas_numeradas(df['Discriminacao'])
+    if n_duplicatas:
+        st.info(f"📝 **Nota:** {n_duplicatas} rubricas têm múltiplas ocorrências na mesma competência (marcadas com #1, #2, etc.)")
+    
+    # Dados principais
+    st.subheader("📋 Dados Extraídos (COM MÚLTIPLAS OCORRÊNCIAS)")
+    st.dataframe(
+        df[['Discriminacao', 'Valor', 'Competencia', 'Ano', 'Tipo']].head(50),
+        use_container_width=True,
+        hide_index=True,
+        height=300
+    )
+
+@st.fragment
+def _aba_filtros(df):
+    """Aba Filtros: seleção de tipos, anos e rubricas (favoritas primeiro)"""
+    st.subheader("🎯 Filtros Avançados")
+    
+    # Filtros básicos
+    col_f1, col_f2 = st.columns(2)
+    with col_f1:
+        tipos = st.multiselect(
+            "Tipo:", 
+            opcoes_unicas(df['Tipo']),
+            default=opcoes_unicas(df['Tipo'])
+        )
+    
+    with col_f2:
+        anos = st.multiselect(
+            "Ano:", 
+            opcoes_unicas(df['Ano']),
+            default=opcoes_unicas(df['Ano'])
+        )
+    
+    # Rubricas com favoritos
+    st.write("**Rubricas:**")
+    rubricas_disponiveis = opcoes_unicas(df['Discriminacao'])
+    favoritas = st.session_state.configurador.carregar_rubricas_favoritas()
+    
+    # Separar favoritas das demais
+    rubricas_favoritas = [r for r in rubricas_disponiveis if r in favoritas]
+    outras_rubricas = [r for r in rubricas_disponiveis if r not in favoritas]
+    
+    # Interface para gerenciar favoritos
+    col_fav1, col_fav2 = st.columns([3, 1])
+    with col_fav1:
+        rubrica_selecionada = st.selectbox(
+            "Selecionar rubrica:",
+            rubricas_disponiveis
+        )
+    
+    with col_fav2:
+        st.write("⠀")  # Espaçamento
+        if rubrica_selecionada in favoritas:
+            if st.button("❌ Remover", key="remover_fav"):
+                st.session_state.configurador.remover_rubrica_favorita(rubrica_selecionada)
+                st.rerun()
+        else:
+            if st.button("⭐ Favoritar", key="adicionar_fav"):
+                st.session_state.configurador.adicionar_rubrica_favorita(rubrica_selecionada)
+                st.rerun()
+    
+    # Seleção de rubricas (favoritas primeiro)
+    todas_rubricas = rubricas_favoritas + outras_rubricas
+    rubricas_selecionadas = st.multiselect(
+        "Selecionar rubricas para análise:",
+        todas_rubricas,
+        default=todas_rubricas[:min(10, len(todas_rubricas))]
+    )
+    
+    # Botões de ação
+    col_btn1, col_btn2 = st.columns(2)
+    with col_btn1:
+        if st.button("✅ Aplicar Filtros", type="primary", use_container_width=True, key="aplicar_filtros"):
+            df_base = st.session_state.dados_extraidos
+            
+            # Uma única máscara combinada e um único recorte do DataFrame
+            mascara = np.ones(len(df_base), dtype=bool)
+            if tipos:
+                mascara &= df_base['Tipo'].isin(tipos).to_numpy()
+            if anos:
+                mascara &= df_base['Ano'].isin(anos).to_numpy()
+            if rubricas_selecionadas:
+                mascara &= df_base['Discriminacao'].isin(rubricas_selecionadas).to_numpy()
+            df_filtrado = df_base[mascara]
+            
+            st.session_state.df_filtrado = df_filtrado
+            st.success(f"✅ {len(df_filtrado)} registros após filtragem")
+            st.rerun()
+    
+    with col_btn2:
+        if st.button("🗑️ Limpar Filtros", use_container_width=True, key="limpar_filtros"):
+            st.session_state.df_filtrado = st.session_state.dados_extraidos
+            st.success("✅ Filtros removidos!")
+            st.rerun()
+
+@st.fragment
+def _aba_analises(df):
+    """Aba Análises: evolução anual e composição de descontos"""
+    st.subheader("📈 Análises Avançadas")
+    
+    if st.session_state.modo_avancado:
+        # Análise comparativa
+        st.write("### 🔄 Análise Comparativa")
+        
+        rubrica_comparar = st.selectbox(
+            "Selecione uma rubrica para análise de evolução:",
+            opcoes_unicas(df['Discriminacao']),
+            key="rubrica_comparar"
+        )
+        
+        if rubrica_comparar:
+            analise = st.session_state.analisador.comparar_evolucao_anual(df, rubrica_comparar)
+            
+            if not analise.empty:
+                st.write(f"**Evolução de {rubrica_comparar}:**")
+                st.dataframe(analise, use_container_width=True)
+                
+                # Gráfico de evolução (se houver dados suficientes)
+                if len(analise.columns) > 1:
+                    try:
+                        fig = px.line(
+                            analise.drop('Total_Anual', errors='ignore'),
+                            title=f"Evolução Mensal - {rubrica_comparar}",
+                            labels={'value': 'Valor', 'variable': 'Ano'}
+                        )
+                        st.plotly_chart(fig, use_container_width=True)
+                    except:
+                        pass
+        
+        # Composição de descontos
+        st.write("### 🧩 Composição de Descontos")
+        
+        ano_analise = st.selectbox(
+            "Selecione o ano para análise:",
+            opcoes_unicas(df['Ano']),
+            key="ano_analise"
+        )
+        
+        if st.button("Analisar Composição", key="analise_comp"):
+            composicao = st.session_state.analisador.analisar_composicao_descontos(df, ano_analise)
+            
+            if composicao and composicao['total_ano'] > 0:
+                # Gráfico de pizza para top 10
+                df_composicao = pd.DataFrame({
+                    'Rubrica': list(composicao['percentuais'].keys()),
+                    'Percentual': list(composicao['percentuais'].values())
+                }).head(10)
+                
+                if not df_composicao.empty:
+                    fig = px.pie(
+                        df_composicao,
+                        values='Percentual',
+                        names='Rubrica',
+                        title=f"Composição dos Descontos - {ano_analise}"
+                    )
+                    st.plotly_chart(fig, use_container_width=True)
+    else:
+        st.info("🔓 Ative o Modo Avançado na barra lateral para acessar estas análises.")
+
+@st.fragment
+def _aba_semestral(df):
+    """Aba Semestral: consolidado, gráfico e top rubricas por semestre"""
+    # NOVA ABA: ANÁLISE SEMESTRAL
+    st.subheader("📅 Análise Semestral")
+    
+    if st.button("📊 Gerar Análise Semestral", type="primary", key="gerar_semestral"):
+        with st.spinner("Analisando dados por semestre..."):
+            # Análise consolidada por semestre
+            analise_semestral = analise_semestral_sessao(df)
+            
+            if not analise_semestral.empty:
+                # Mostrar tabela consolidada
+                st.write("### 📋 Consolidado por Semestre")
+                
+                # CORREÇÃO: Verificar quais colunas realmente existem
+                colunas_exibicao = ['Semestre_Label']
+                mapeamento_colunas = {}
+                
+                if 'RENDIMENTO_Formatado' in analise_semestral.columns:
+                    colunas_exibicao.append('RENDIMENTO_Formatado')
+                    mapeamento_colunas['RENDIMENTO_Formatado'] = 'RENDIMENTOS'
+                
+                if 'DESCONTO_Formatado' in analise_semestral.columns:
+                    colunas_exibicao.append('DESCONTO_Formatado')
+                    mapeamento_colunas['DESCONTO_Formatado'] = 'DESCONTOS'
+                
+                if 'LIQUIDO_Formatado' in analise_semestral.columns:
+                    colunas_exibicao.append('LIQUIDO_Formatado')
+                    mapeamento_colunas['LIQUIDO_Formatado'] = 'LÍQUIDO'
+                
+                # Criar DataFrame para exibição
+                df_exibicao = analise_semestral[colunas_exibicao].copy()
+                
+                # Renomear colunas
+                df_exibicao = df_exibicao.rename(columns=mapeamento_colunas)
+                
+                st.dataframe(
+                    df_exibicao,
+                    use_container_width=True,
+                    hide_index=True
+                )
+                
+                # CORREÇÃO: Verificar se temos dados numéricos para gráficos
+                if 'RENDIMENTO' in analise_semestral.columns and 'DESCONTO' in analise_semestral.columns:
+                    fig = go.Figure()
+                    
+                    fig.add_trace(go.Bar(
+                        x=analise_semestral['Semestre_Label'],
+                        y=analise_semestral['RENDIMENTO'],
+                        name='Rendimentos',
+                        marker_color='#2ecc71'
+                    ))
+                    
+                    fig.add_trace(go.Bar(
+                        x=analise_semestral['Semestre_Label'],
+                        y=analise_semestral['DESCONTO'],
+                        name='Descontos',
+                        marker_color='#e74c3c'
+                    ))
+                    
+                    if 'LIQUIDO' in analise_semestral.columns:
+                        fig.add_trace(go.Scatter(
+                            x=analise_semestral['Semestre_Label'],
+                            y=analise_semestral['LIQUIDO'],
+                            name='Líquido',
+                            mode='lines+markers',
+                            line=dict(color='#3498db', width=3),
+                            marker=dict(size=8)
+                        ))
+                    
+                    fig.update_layout(
+                        title='Evolução Semestral',
+                        xaxis_title='Semestre',
+                        yaxis_title='Valor (R$)',
+                        barmode='group',
+                        height=500
+                    )
+                    
+                    st.plotly_chart(fig, use_container_width=True)
+                else:
+                    st.info("⚠️ Não há dados suficientes para gerar o gráfico de evolução semestral.")
+                
+                # Análise detalhada por rubrica
+                st.write("### 🔍 Top Rubricas por Semestre")
+                
+                analise_detalhada = st.session_state.analisador_semestral.analisar_rubricas_por_semestre(df, top_n=5)
+                
+                if analise_detalhada and 'anos_analisados' in analise_detalhada:
+                    anos = analise_detalhada.get('anos_analisados', [])
+                    
+                    for ano in anos:
+                        for semestre in [1, 2]:
+                            chave = f"{ano}-S{semestre}"
+                            
+                            # CORREÇÃO: Verificar se a chave existe em ambos os dicionários
+                            tem_descontos = chave in analise_detalhada.get('descontos_por_semestre', {})
+                            tem_rendimentos = chave in analise_detalhada.get('rendimentos_por_semestre', {})
+                            
+                            if tem_descontos or tem_rendimentos:
+                                st.write(f"#### 📊 {ano} - {semestre}º Semestre")
+                                
+                                col_s1, col_s2 = st.columns(2)
+                                
+                                with col_s1:
+                                    if tem_descontos:
+                                        st.write("**💰 Top Descontos:**")
+                                        descontos = analise_detalhada['descontos_por_semestre'][chave]['top_rubricas']
+                                        for rubrica, valor in descontos.items():
+                                            st.write(f"- {rubrica}: R$ {formatar_valor_brasileiro(valor)}")
+                                    else:
+                                        st.write("**💰 Top Descontos:**")
+                                        st.write("*Sem dados de descontos*")
+                                
+                                with col_s2:
+                                    if tem_rendimentos:
+                                        st.write("**💵 Top Rendimentos:**")
+                                        rendimentos = analise_detalhada['rendimentos_por_semestre'][chave]['top_rubricas']
+                                        for rubrica, valor in rendimentos.items():
+                                            st.write(f"- {rubrica}: R$ {formatar_valor_brasileiro(valor)}")
+                                    else:
+                                        st.write("**💵 Top Rendimentos:**")
+                                        st.write("*Sem dados de rendimentos*")
+                                
+                                st.divider()
+                else:
+                    st.warning("Não foi possível gerar análise detalhada por semestre.")
+            else:
+                st.warning("Não foi possível gerar análise semestral. Verifique se há dados para os meses necessários.")
+
+@st.fragment
+def _aba_relatorios(df):
+    """Aba Relatórios: aplicação dos templates de relatório"""
+    st.subheader("📋 Relatórios Personalizados")
+    
+    if st.session_state.modo_avancado:
+        # Template selecionado
+        if st.session_state.template_selecionado:
+            template = st.session_state.template_manager.templates[
+                st.session_state.template_selecionado
+            ]
+            
+            st.write(f"### 📄 {template['nome']}")
+            st.write(template['descricao'])
+            
+            if st.button("🔄 Gerar Relatório", type="primary", key="gerar_relatorio"):
+                with st.spinner("Gerando relatório..."):
+                    # Aplica template
+                    df_template = st.session_state.template_manager.aplicar_template(
+                        df, 
+                        st.session_state.template_selecionado
+                    )
+                    
+                    # Mostrar dados
+                    st.write("#### 📊 Dados do Relatório")
+                    st.dataframe(
+                        df_template,
+                        use_container_width=True,
+                        height=300
+                    )
+                    
+                    # Estatísticas básicas
+                    if not df_template.empty and 'Valor' in df_template.columns:
+                        df_template['Valor_Numerico'] = ExtratorDemonstrativos.valores_numericos(df_template)
+                        
+                        st.write("#### 📈 Estatísticas")
+                        col_s1, col_s2, col_s3 = st.columns(3)
+                        with col_s1:
+                            st.metric("Total Registros", len(df_template))
+                        with col_s2:
+                            total_valor = df_template['Valor_Numerico'].sum()
+                            st.metric("Valor Total", formatar_valor_brasileiro(total_valor))
+                        with col_s3:
+                            if 'Discriminacao' in df_template.columns:
+                                st.metric("Rubricas Únicas", df_template['Discriminacao'].nunique())
+    else:
+        st.info("🔓 Ative o Modo Avançado para acessar templates de relatórios.")
+
+@st.fragment
+def _aba_exportar(df, nome_arquivo):
+    """Aba Exportar: dados e análises em Excel/CSV"""
+    st.subheader("📥 Exportação de Dados")
+    
+    # Opções de exportação
+    formato = st.radio(
+        "Formato:",
+        ["Excel (XLSX)", "CSV"],
+        horizontal=True,
+        key="formato_export"
+    )
+    
+    # Botões de exportação
+    col_e1, col_e2, col_e3 = st.columns(3)
+    
+    with col_e1:
+        if st.button("💾 Exportar Dados", use_container_width=True, key="exportar_dados"):
+            exportar_dados(df, formato, nome_arquivo)
+    
+    with col_e2:
+        if st.button("📊 Exportar + Análises", use_container_width=True, key="exportar_analises"):
+            # Exporta com análises básicas
+            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+            buffer = io.BytesIO()
+            
+            with pd.ExcelWriter(buffer, engine='xlsxwriter') as writer:
+                # Dados principais
+                df.to_excel(writer, index=False, sheet_name='Dados')
+                
+                # Análise de composição (se houver descontos)
+                if 'DESCONTO' in df['Tipo'].unique():
+                    composicoes = st.session_state.analisador.composicao_todos_anos(df)
+                    for ano, composicao in composicoes.items():
+                        if composicao['total_ano'] > 0:
+                            df_comp = pd.DataFrame({
+                                'Rubrica': list(composicao['composicao'].keys()),
+                                'Valor': list(composicao['composicao'].values()),
+                                'Percentual': list(composicao['percentuais'].values())
+                            })
+                            df_comp.to_excel(writer, index=False, sheet_name=f"Comp_{ano}")
+                
+                # Análise semestral (nova funcionalidade)
+                analise_semestral = analise_semestral_sessao(df)
+                if not analise_semestral.empty:
+                    analise_semestral.to_excel(writer, index=False, sheet_name='Análise_Semestral')
+            
+            buffer.seek(0)
+            st.download_button(
+                label="⬇️ Baixar Excel com Análises",
+                data=buffer,
+                file_name=f"demonstrativos_analises_{timestamp}.xlsx",
+                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+            )
+    
+    with col_e3:
+        if st.button("🔄 Novo Arquivo", type="secondary", use_container_width=True, key="novo_arquivo"):
+            st.session_state.dados_extraidos = None
+            st.session_state.df_filtrado = None
+            st.session_state.arquivo_processado = None
+            st.rerun()
+
 def main():
     st.set_page_config(
         page_title="Extrator Avançado de Demonstrativos",
@@ -866,16 +1422,17 @@ def main():
             if st.button("🔍 Processar Demonstrativos", type="primary", use_container_width=True):
                 with st.spinner("Processando PDF..."):
                     try:
-                        extrator = ExtratorDemonstrativos()
-                        df = extrator.processar_pdf(
-                            uploaded_file,
-                            extrair_proventos=extrair_proventos,
-                            extrair_descontos=extrair_descontos
+                        df = _processar_pdf_cached(
+                            uploaded_file.getvalue(),
+                            extrair_proventos,
+                            extrair_descontos
                         )
                         
                         if not df.empty:
+                            # Os filtros nunca alteram o DataFrame no lugar (sempre geram um novo
+                            # recorte), então dados_extraidos e df_filtrado podem compartilhar o objeto
                             st.session_state.dados_extraidos = df
-                            st.session_state.df_filtrado = df.copy()
+                            st.session_state.df_filtrado = df
                             
                             # Aplica correção monetária se solicitado
                             if (st.session_state.modo_avancado and 
@@ -883,7 +1440,7 @@ def main():
                                 st.session_state.indice_correcao != 'Nenhum' and
                                 st.session_state.data_correcao):
                                 
-                                df_corrigido = st.session_state.corretor.aplicar_correcao_dataframe(
+                                df_corrigido = _aplicar_correcao_cached(
                                     df,
                                     st.session_state.data_correcao,
                                     st.session_state.indice_correcao
@@ -892,9 +1449,9 @@ def main():
                                 st.info(f"✅ Correção monetária aplicada ({st.session_state.indice_correcao})")
                             
                             # Verifica se há rubricas duplicadas
-                            duplicatas = df[df['Discriminacao'].str.contains('#')]
-                            if not duplicatas.empty:
-                                st.info(f"✅ Encontradas {len(duplicatas)} rubricas com múltiplas ocorrências (marcadas com #1, #2, etc.)")
+                            n_duplicatas = contar_rubricas_numeradas(df['Discriminacao'])
+                            if n_duplicatas:
+                                st.info(f"✅ Encontradas {n_duplicatas} rubricas com múltiplas ocorrências (marcadas com #1, #2, etc.)")
                             
                             st.success(f"✅ {len(df)} registros extraídos!")
                             st.rerun()
@@ -921,411 +1478,25 @@ def main():
                 "📥 Exportar"
             ])
             
+            # Cada aba é um fragmento: interagir com ela reexecuta só a própria aba
+            # (os st.rerun() dentro delas continuam reexecutando o app inteiro)
             with tab1:
-                # Estatísticas rápidas
-                st.subheader("📊 Visão Geral")
-                
-                col1, col2, col3, col4 = st.columns(4)
-                with col1:
-                    st.metric("Total Registros", len(df))
-                with col2:
-                    st.metric("Anos", df['Ano'].nunique())
-                with col3:
-                    st.metric("Rubricas Únicas", df['Discriminacao'].nunique())
-                with col4:
-                    st.metric("Valor Total", formatar_valor_total(df))
-                
-                # Verificação de rubricas duplicadas
-                duplicatas = df[df['Discriminacao'].str.contains('#')]
-                if not duplicatas.empty:
-                    st.info(f"📝 **Nota:** {len(duplicatas)} rubricas têm múltiplas ocorrências na mesma competência (marcadas com #1, #2, etc.)")
-                
-                # Dados principais
-                st.subheader("📋 Dados Extraídos (COM MÚLTIPLAS OCORRÊNCIAS)")
-                st.dataframe(
-                    df[['Discriminacao', 'Valor', 'Competencia', 'Ano', 'Tipo']].head(50),
-                    use_container_width=True,
-                    hide_index=True,
-                    height=300
-                )
+                _aba_dashboard(df)
             
             with tab2:
-                st.subheader("🎯 Filtros Avançados")
-                
-                # Filtros básicos
-                col_f1, col_f2 = st.columns(2)
-                with col_f1:
-                    tipos = st.multiselect(
-                        "Tipo:", 
-                        sorted(df['Tipo'].unique()),
-                        default=sorted(df['Tipo'].unique())
-                    )
-                
-                with col_f2:
-                    anos = st.multiselect(
-                        "Ano:", 
-                        sorted(df['Ano'].unique()),
-                        default=sorted(df['Ano'].unique())
-                    )
-                
-                # Rubricas com favoritos
-                st.write("**Rubricas:**")
-                rubricas_disponiveis = sorted(df['Discriminacao'].unique())
-                favoritas = st.session_state.configurador.carregar_rubricas_favoritas()
-                
-                # Separar favoritas das demais
-                rubricas_favoritas = [r for r in rubricas_disponiveis if r in favoritas]
-                outras_rubricas = [r for r in rubricas_disponiveis if r not in favoritas]
-                
-                # Interface para gerenciar favoritos
-                col_fav1, col_fav2 = st.columns([3, 1])
-                with col_fav1:
-                    rubrica_selecionada = st.selectbox(
-                        "Selecionar rubrica:",
-                        rubricas_disponiveis
-                    )
-                
-                with col_fav2:
-                    st.write("⠀")  # Espaçamento
-                    if rubrica_selecionada in favoritas:
-                        if st.button("❌ Remover", key="remover_fav"):
-                            st.session_state.configurador.remover_rubrica_favorita(rubrica_selecionada)
-                            st.rerun()
-                    else:
-                        if st.button("⭐ Favoritar", key="adicionar_fav"):
-                            st.session_state.configurador.adicionar_rubrica_favorita(rubrica_selecionada)
-                            st.rerun()
-                
-                # Seleção de rubricas (favoritas primeiro)
-                todas_rubricas = rubricas_favoritas + outras_rubricas
-                rubricas_selecionadas = st.multiselect(
-                    "Selecionar rubricas para análise:",
-                    todas_rubricas,
-                    default=todas_rubricas[:min(10, len(todas_rubricas))]
-                )
-                
-                # Botões de ação
-                col_btn1, col_btn2 = st.columns(2)
-                with col_btn1:
-                    if st.button("✅ Aplicar Filtros", type="primary", use_container_width=True, key="aplicar_filtros"):
-                        df_filtrado = st.session_state.dados_extraidos.copy()
-                        
-                        if tipos:
-                            df_filtrado = df_filtrado[df_filtrado['Tipo'].isin(tipos)]
-                        if anos:
-                            df_filtrado = df_filtrado[df_filtrado['Ano'].isin(anos)]
-                        if rubricas_selecionadas:
-                            df_filtrado = df_filtrado[df_filtrado['Discriminacao'].isin(rubricas_selecionadas)]
-                        
-                        st.session_state.df_filtrado = df_filtrado
-                        st.success(f"✅ {len(df_filtrado)} registros após filtragem")
-                        st.rerun()
-                
-                with col_btn2:
-                    if st.button("🗑️ Limpar Filtros", use_container_width=True, key="limpar_filtros"):
-                        st.session_state.df_filtrado = st.session_state.dados_extraidos.copy()
-                        st.success("✅ Filtros removidos!")
-                        st.rerun()
+                _aba_filtros(df)
             
             with tab3:
-                st.subheader("📈 Análises Avançadas")
-                
-                if st.session_state.modo_avancado:
-                    # Análise comparativa
-                    st.write("### 🔄 Análise Comparativa")
-                    
-                    rubrica_comparar = st.selectbox(
-                        "Selecione uma rubrica para análise de evolução:",
-                        sorted(df['Discriminacao'].unique()),
-                        key="rubrica_comparar"
-                    )
-                    
-                    if rubrica_comparar:
-                        analise = st.session_state.analisador.comparar_evolucao_anual(df, rubrica_comparar)
-                        
-                        if not analise.empty:
-                            st.write(f"**Evolução de {rubrica_comparar}:**")
-                            st.dataframe(analise, use_container_width=True)
-                            
-                            # Gráfico de evolução (se houver dados suficientes)
-                            if len(analise.columns) > 1:
-                                try:
-                                    fig = px.line(
-                                        analise.drop('Total_Anual', errors='ignore'),
-                                        title=f"Evolução Mensal - {rubrica_comparar}",
-                                        labels={'value': 'Valor', 'variable': 'Ano'}
-                                    )
-                                    st.plotly_chart(fig, use_container_width=True)
-                                except:
-                                    pass
-                    
-                    # Composição de descontos
-                    st.write("### 🧩 Composição de Descontos")
-                    
-                    ano_analise = st.selectbox(
-                        "Selecione o ano para análise:",
-                        sorted(df['Ano'].unique()),
-                        key="ano_analise"
-                    )
-                    
-                    if st.button("Analisar Composição", key="analise_comp"):
-                        composicao = st.session_state.analisador.analisar_composicao_descontos(df, ano_analise)
-                        
-                        if composicao and composicao['total_ano'] > 0:
-                            # Gráfico de pizza para top 10
-                            df_composicao = pd.DataFrame({
-                                'Rubrica': list(composicao['percentuais'].keys()),
-                                'Percentual': list(composicao['percentuais'].values())
-                            }).head(10)
-                            
-                            if not df_composicao.empty:
-                                fig = px.pie(
-                                    df_composicao,
-                                    values='Percentual',
-                                    names='Rubrica',
-                                    title=f"Composição dos Descontos - {ano_analise}"
-                                )
-                                st.plotly_chart(fig, use_container_width=True)
-                else:
-                    st.info("🔓 Ative o Modo Avançado na barra lateral para acessar estas análises.")
+                _aba_analises(df)
             
             with tab4:
-                # NOVA ABA: ANÁLISE SEMESTRAL
-                st.subheader("📅 Análise Semestral")
-                
-                if st.button("📊 Gerar Análise Semestral", type="primary", key="gerar_semestral"):
-                    with st.spinner("Analisando dados por semestre..."):
-                        # Análise consolidada por semestre
-                        analise_semestral = st.session_state.analisador_semestral.analisar_por_semestre(df)
-                        
-                        if not analise_semestral.empty:
-                            # Mostrar tabela consolidada
-                            st.write("### 📋 Consolidado por Semestre")
-                            
-                            # CORREÇÃO: Verificar quais colunas realmente existem
-                            colunas_exibicao = ['Semestre_Label']
-                            mapeamento_colunas = {}
-                            
-                            if 'RENDIMENTO_Formatado' in analise_semestral.columns:
-                                colunas_exibicao.append('RENDIMENTO_Formatado')
-                                mapeamento_colunas['RENDIMENTO_Formatado'] = 'RENDIMENTOS'
-                            
-                            if 'DESCONTO_Formatado' in analise_semestral.columns:
-                                colunas_exibicao.append('DESCONTO_Formatado')
-                                mapeamento_colunas['DESCONTO_Formatado'] = 'DESCONTOS'
-                            
-                            if 'LIQUIDO_Formatado' in analise_semestral.columns:
-                                colunas_exibicao.append('LIQUIDO_Formatado')
-                                mapeamento_colunas['LIQUIDO_Formatado'] = 'LÍQUIDO'
-                            
-                            # Criar DataFrame para exibição
-                            df_exibicao = analise_semestral[colunas_exibicao].copy()
-                            
-                            # Renomear colunas
-                            df_exibicao = df_exibicao.rename(columns=mapeamento_colunas)
-                            
-                            st.dataframe(
-                                df_exibicao,
-                                use_container_width=True,
-                                hide_index=True
-                            )
-                            
-                            # CORREÇÃO: Verificar se temos dados numéricos para gráficos
-                            if 'RENDIMENTO' in analise_semestral.columns and 'DESCONTO' in analise_semestral.columns:
-                                fig = go.Figure()
-                                
-                                fig.add_trace(go.Bar(
-                                    x=analise_semestral['Semestre_Label'],
-                                    y=analise_semestral['RENDIMENTO'],
-                                    name='Rendimentos',
-                                    marker_color='#2ecc71'
-                                ))
-                                
-                                fig.add_trace(go.Bar(
-                                    x=analise_semestral['Semestre_Label'],
-                                    y=analise_semestral['DESCONTO'],
-                                    name='Descontos',
-                                    marker_color='#e74c3c'
-                                ))
-                                
-                                if 'LIQUIDO' in analise_semestral.columns:
-                                    fig.add_trace(go.Scatter(
-                                        x=analise_semestral['Semestre_Label'],
-                                        y=analise_semestral['LIQUIDO'],
-                                        name='Líquido',
-                                        mode='lines+markers',
-                                        line=dict(color='#3498db', width=3),
-                                        marker=dict(size=8)
-                                    ))
-                                
-                                fig.update_layout(
-                                    title='Evolução Semestral',
-                                    xaxis_title='Semestre',
-                                    yaxis_title='Valor (R$)',
-                                    barmode='group',
-                                    height=500
-                                )
-                                
-                                st.plotly_chart(fig, use_container_width=True)
-                            else:
-                                st.info("⚠️ Não há dados suficientes para gerar o gráfico de evolução semestral.")
-                            
-                            # Análise detalhada por rubrica
-                            st.write("### 🔍 Top Rubricas por Semestre")
-                            
-                            analise_detalhada = st.session_state.analisador_semestral.analisar_rubricas_por_semestre(df, top_n=5)
-                            
-                            if analise_detalhada and 'anos_analisados' in analise_detalhada:
-                                anos = analise_detalhada.get('anos_analisados', [])
-                                
-                                for ano in anos:
-                                    for semestre in [1, 2]:
-                                        chave = f"{ano}-S{semestre}"
-                                        
-                                        # CORREÇÃO: Verificar se a chave existe em ambos os dicionários
-                                        tem_descontos = chave in analise_detalhada.get('descontos_por_semestre', {})
-                                        tem_rendimentos = chave in analise_detalhada.get('rendimentos_por_semestre', {})
-                                        
-                                        if tem_descontos or tem_rendimentos:
-                                            st.write(f"#### 📊 {ano} - {semestre}º Semestre")
-                                            
-                                            col_s1, col_s2 = st.columns(2)
-                                            
-                                            with col_s1:
-                                                if tem_descontos:
-                                                    st.write("**💰 Top Descontos:**")
-                                                    descontos = analise_detalhada['descontos_por_semestre'][chave]['top_rubricas']
-                                                    for rubrica, valor in descontos.items():
-                                                        st.write(f"- {rubrica}: R$ {formatar_valor_brasileiro(valor)}")
-                                                else:
-                                                    st.write("**💰 Top Descontos:**")
-                                                    st.write("*Sem dados de descontos*")
-                                            
-                                            with col_s2:
-                                                if tem_rendimentos:
-                                                    st.write("**💵 Top Rendimentos:**")
-                                                    rendimentos = analise_detalhada['rendimentos_por_semestre'][chave]['top_rubricas']
-                                                    for rubrica, valor in rendimentos.items():
-                                                        st.write(f"- {rubrica}: R$ {formatar_valor_brasileiro(valor)}")
-                                                else:
-                                                    st.write("**💵 Top Rendimentos:**")
-                                                    st.write("*Sem dados de rendimentos*")
-                                            
-                                            st.divider()
-                            else:
-                                st.warning("Não foi possível gerar análise detalhada por semestre.")
-                        else:
-                            st.warning("Não foi possível gerar análise semestral. Verifique se há dados para os meses necessários.")
+                _aba_semestral(df)
             
             with tab5:
-                st.subheader("📋 Relatórios Personalizados")
-                
-                if st.session_state.modo_avancado:
-                    # Template selecionado
-                    if st.session_state.template_selecionado:
-                        template = st.session_state.template_manager.templates[
-                            st.session_state.template_selecionado
-                        ]
-                        
-                        st.write(f"### 📄 {template['nome']}")
-                        st.write(template['descricao'])
-                        
-                        if st.button("🔄 Gerar Relatório", type="primary", key="gerar_relatorio"):
-                            with st.spinner("Gerando relatório..."):
-                                # Aplica template
-                                df_template = st.session_state.template_manager.aplicar_template(
-                                    df, 
-                                    st.session_state.template_selecionado
-                                )
-                                
-                                # Mostrar dados
-                                st.write("#### 📊 Dados do Relatório")
-                                st.dataframe(
-                                    df_template,
-                                    use_container_width=True,
-                                    height=300
-                                )
-                                
-                                # Estatísticas básicas
-                                if not df_template.empty and 'Valor' in df_template.columns:
-                                    extrator = ExtratorDemonstrativos()
-                                    df_template['Valor_Numerico'] = df_template['Valor'].apply(
-                                        lambda x: extrator.converter_valor_string(x) or 0
-                                    )
-                                    
-                                    st.write("#### 📈 Estatísticas")
-                                    col_s1, col_s2, col_s3 = st.columns(3)
-                                    with col_s1:
-                                        st.metric("Total Registros", len(df_template))
-                                    with col_s2:
-                                        total_valor = df_template['Valor_Numerico'].sum()
-                                        st.metric("Valor Total", formatar_valor_brasileiro(total_valor))
-                                    with col_s3:
-                                        if 'Discriminacao' in df_template.columns:
-                                            st.metric("Rubricas Únicas", df_template['Discriminacao'].nunique())
-                else:
-                    st.info("🔓 Ative o Modo Avançado para acessar templates de relatórios.")
+                _aba_relatorios(df)
             
             with tab6:
-                st.subheader("📥 Exportação de Dados")
-                
-                # Opções de exportação
-                formato = st.radio(
-                    "Formato:",
-                    ["Excel (XLSX)", "CSV"],
-                    horizontal=True,
-                    key="formato_export"
-                )
-                
-                # Botões de exportação
-                col_e1, col_e2, col_e3 = st.columns(3)
-                
-                with col_e1:
-                    if st.button("💾 Exportar Dados", use_container_width=True, key="exportar_dados"):
-                        exportar_dados(df, formato, uploaded_file.name)
-                
-                with col_e2:
-                    if st.button("📊 Exportar + Análises", use_container_width=True, key="exportar_analises"):
-                        # Exporta com análises básicas
-                        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-                        buffer = io.BytesIO()
-                        
-                        with pd.ExcelWriter(buffer, engine='openpyxl') as writer:
-                            # Dados principais
-                            df.to_excel(writer, index=False, sheet_name='Dados')
-                            
-                            # Análise de composição (se houver descontos)
-                            if 'DESCONTO' in df['Tipo'].unique():
-                                anos_unicos = sorted(df['Ano'].unique())
-                                for ano in anos_unicos:
-                                    composicao = st.session_state.analisador.analisar_composicao_descontos(df, ano)
-                                    if composicao and composicao['total_ano'] > 0:
-                                        df_comp = pd.DataFrame({
-                                            'Rubrica': list(composicao['composicao'].keys()),
-                                            'Valor': list(composicao['composicao'].values()),
-                                            'Percentual': list(composicao['percentuais'].values())
-                                        })
-                                        df_comp.to_excel(writer, index=False, sheet_name=f"Comp_{ano}")
-                            
-                            # Análise semestral (nova funcionalidade)
-                            analise_semestral = st.session_state.analisador_semestral.analisar_por_semestre(df)
-                            if not analise_semestral.empty:
-                                analise_semestral.to_excel(writer, index=False, sheet_name='Análise_Semestral')
-                        
-                        buffer.seek(0)
-                        st.download_button(
-                            label="⬇️ Baixar Excel com Análises",
-                            data=buffer,
-                            file_name=f"demonstrativos_analises_{timestamp}.xlsx",
-                            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-                        )
-                
-                with col_e3:
-                    if st.button("🔄 Novo Arquivo", type="secondary", use_container_width=True, key="novo_arquivo"):
-                        st.session_state.dados_extraidos = None
-                        st.session_state.df_filtrado = None
-                        st.session_state.arquivo_processado = None
-                        st.rerun()
+                _aba_exportar(df, uploaded_file.name)
     
     else:
         # Tela inicial
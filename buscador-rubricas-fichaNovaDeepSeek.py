@@ -1,11 +1,11 @@
 import streamlit as st
-import pdfplumber
 import pandas as pd
 import re
-from datetime import datetime
 from io import BytesIO
 from collections import defaultdict
 
+from leitura_pdf import extrair_textos
+
 st.set_page_config(layout="wide")
 
 MESES_MAPA = {
@@ -13,6 +13,16 @@ MESES_MAPA = {
     "JUL":7,"AGO":8,"SET":9,"OUT":10,"NOV":11,"DEZ":12
 }
 
+# Padrões compilados uma única vez (aplicados a cada linha do PDF)
+ANO_RE = re.compile(r"\b(20\d{2}|19\d{2})\b")
+VALOR_RE = re.compile(r"\d{1,3}(?:\.\d{3})*,\d{2}")
+MESES_RE = re.compile("|".join(MESES_MAPA))  # qualquer sigla de mês em qualquer ponto da linha
+LINHA_RUBRICA_RE = re.compile(r"(.+?)\s+((?:\d{1,3}(?:\.\d{3})*,\d{2}\s*)+)")
+NOME_RE = re.compile(r"NOME.*?\n(.+)", re.IGNORECASE)
+CPF_RE = re.compile(r"\d{3}\.\d{3}\.\d{3}-\d{2}")
+CARGO_RE = re.compile(r"CARGO.*?\n(.+)", re.IGNORECASE)
+EMISSAO_RE = re.compile(r"EMISS[ÃA]O.*?(\d{2}/\d{2}/\d{4})")
+
 class FichaFinanceiraParser:
 
     def __init__(self, pdf_bytes):
@@ -21,42 +31,39 @@ class FichaFinanceiraParser:
         self.ano_atual = None
         self.meses_ativos = []
         self.metadados = {}
-        self.dados = []
+        # Uma lista por coluna: o DataFrame é montado de uma vez no final
+        self.dados = {coluna: [] for coluna in ("Discriminacao", "Valor", "Competencia", "Pagina", "Ano", "Tipo")}
         self.logs = []
 
-    def _normalizar_moeda(self, valor):
-        if not valor:
-            return None
-        valor = valor.replace('.', '').replace(',', '.')
-        try:
-            return float(valor)
-        except:
-            return None
+    def _normalizar_moeda(self, valores):
+        # Converte a coluna inteira de uma vez ("1.234,56" -> 1234.56)
+        valores = valores.str.replace('.', '', regex=False).str.replace(',', '.', regex=False)
+        return pd.to_numeric(valores, errors="coerce")
 
     def _detectar_ano(self, linha):
-        match = re.search(r"\b(20\d{2}|19\d{2})\b", linha)
+        match = ANO_RE.search(linha)
         if match:
             self.ano_atual = int(match.group())
 
-    def _detectar_meses(self, linha):
-        meses_detectados = []
-        for mes in MESES_MAPA.keys():
-            if mes in linha.upper():
-                meses_detectados.append(mes)
+    def _detectar_meses(self, linha_upper):
+        # Linhas sem nenhuma sigla de mês (quase todas) saem com uma só varredura
+        if not MESES_RE.search(linha_upper):
+            return
+        meses_detectados = [mes for mes in MESES_MAPA if mes in linha_upper]
         if len(meses_detectados) >= 3:
             self.meses_ativos = meses_detectados
 
-    def _detectar_tipo(self, linha):
-        if "RENDIMENTO" in linha.upper():
+    def _detectar_tipo(self, linha_upper):
+        if "RENDIMENTO" in linha_upper:
             self.tipo_atual = "RECEITA"
-        elif "DESCONTO" in linha.upper():
+        elif "DESCONTO" in linha_upper:
             self.tipo_atual = "DESCONTO"
 
     def _extrair_metadados(self, texto):
-        nome = re.search(r"NOME.*?\n(.+)", texto, re.IGNORECASE)
-        cpf = re.search(r"\d{3}\.\d{3}\.\d{3}-\d{2}", texto)
-        cargo = re.search(r"CARGO.*?\n(.+)", texto, re.IGNORECASE)
-        emissao = re.search(r"EMISS[ÃA]O.*?(\d{2}/\d{2}/\d{4})", texto)
+        nome = NOME_RE.search(texto)
+        cpf = CPF_RE.search(texto)
+        cargo = CARGO_RE.search(texto)
+        emissao = EMISSAO_RE.search(texto)
 
         self.metadados = {
             "Nome": nome.group(1).strip() if nome else "",
@@ -67,76 +74,83 @@ class FichaFinanceiraParser:
 
     def _processar_linha_rubrica(self, linha, pagina):
 
-        padrao = r"(.+?)\s+((?:\d{1,3}(?:\.\d{3})*,\d{2}\s*)+)"
-        match = re.match(padrao, linha)
+        match = LINHA_RUBRICA_RE.match(linha)
 
         if not match:
             return
 
         descricao = match.group(1).strip()
-        valores = re.findall(r"\d{1,3}(?:\.\d{3})*,\d{2}", match.group(2))
-
-        for i, valor in enumerate(valores):
-            if i >= len(self.meses_ativos):
-                continue
-
-            mes = self.meses_ativos[i]
-            mes_num = MESES_MAPA[mes]
-
-            valor_float = self._normalizar_moeda(valor)
+        valores = VALOR_RE.findall(match.group(2))
 
-            if valor_float and valor_float != 0 and self.ano_atual:
-
-                competencia = datetime(self.ano_atual, mes_num, 1)
+        if not self.ano_atual:
+            return
 
-                self.dados.append({
-                    "Discriminacao": descricao,
-                    "Valor": valor_float,
-                    "Competencia": competencia.strftime("%m/%Y"),
-                    "Pagina": pagina,
-                    "Ano": self.ano_atual,
-                    "Tipo": self.tipo_atual
-                })
+        # Cada valor casa com o mês ativo da mesma posição (sobras são ignoradas);
+        # meses zerados saem aqui, antes de virar linha e passar pela conversão
+        pares = [(mes, valor) for mes, valor in zip(self.meses_ativos, valores) if valor != "0,00"]
+        meses = [mes for mes, _ in pares]
+        n = len(pares)
+        self.dados["Discriminacao"].extend([descricao] * n)
+        self.dados["Valor"].extend(valor for _, valor in pares)
+        self.dados["Competencia"].extend(f"{MESES_MAPA[mes]:02d}/{self.ano_atual}" for mes in meses)
+        self.dados["Pagina"].extend([pagina] * n)
+        self.dados["Ano"].extend([self.ano_atual] * n)
+        self.dados["Tipo"].extend([self.tipo_atual] * n)
 
     def executar(self):
 
-        with pdfplumber.open(self.pdf_bytes) as pdf:
-
-            for numero_pagina, pagina in enumerate(pdf.pages, start=1):
+        # Texto de todas as páginas extraído antes; a leitura das linhas segue sequencial,
+        # pois ano, meses e tipo atuais passam de uma página para a seguinte
+        for numero_pagina, texto in enumerate(extrair_textos(self.pdf_bytes.getvalue()), start=1):
 
-                texto = pagina.extract_text()
-                if not texto:
-                    continue
+            if not texto:
+                continue
 
-                if numero_pagina == 1:
-                    self._extrair_metadados(texto)
+            if numero_pagina == 1:
+                self._extrair_metadados(texto)
 
-                linhas = texto.split("\n")
+            linhas = texto.split("\n")
 
-                for linha in linhas:
+            for linha in linhas:
 
-                    self._detectar_ano(linha)
-                    self._detectar_meses(linha)
-                    self._detectar_tipo(linha)
-                    self._processar_linha_rubrica(linha, numero_pagina)
+                linha_upper = linha.upper()  # uma vez por linha, não por mês testado
+                self._detectar_ano(linha)
+                self._detectar_meses(linha_upper)
+                self._detectar_tipo(linha_upper)
+                self._processar_linha_rubrica(linha, numero_pagina)
 
         df = pd.DataFrame(self.dados)
 
         if not df.empty:
-            df = df.sort_values("Competencia")
+            # Valores convertidos em lote; zerados são descartados
+            df["Valor"] = self._normalizar_moeda(df["Valor"])
+            df = df[df["Valor"].notna() & (df["Valor"] != 0)].reset_index(drop=True)
+            # Chave inteira AAAAMM: o texto "MM/AAAA" ordenaria 01/2020 antes de 02/2019
+            chave = df["Ano"] * 100 + df["Competencia"].str[:2].astype(int)
+            df = df.iloc[chave.argsort(kind="stable")]
+            # Poucas rubricas/tipos repetidos em milhares de linhas: categorias (isin por códigos);
+            # página e ano cabem em int16
+            df = df.astype({"Discriminacao": "category", "Competencia": "category", "Tipo": "category", "Pagina": "int16", "Ano": "int16"})
 
         return df, self.metadados
 
 
+@st.cache_data(show_spinner=False)
+def extrair_ficha(pdf_bytes):
+    # Chave do cache: conteúdo do PDF (reruns e reenvios do mesmo arquivo não reprocessam)
+    parser = FichaFinanceiraParser(BytesIO(pdf_bytes))
+    return parser.executar()
+
+
 def gerar_excel(df_filtrado, metadados):
 
     output = BytesIO()
 
-    with pd.ExcelWriter(output, engine="openpyxl") as writer:
+    with pd.ExcelWriter(output, engine="xlsxwriter") as writer:
 
         df_filtrado.to_excel(writer, sheet_name="Rubricas Detalhadas", index=False)
 
-        consolidado = df_filtrado.groupby(["Ano","Discriminacao"])["Valor"].sum().reset_index()
+        consolidado = df_filtrado.groupby(["Ano","Discriminacao"], observed=True)["Valor"].sum().reset_index()
         consolidado.to_excel(writer, sheet_name="Consolidado Anual", index=False)
 
         df_meta = pd.DataFrame(list(metadados.items()), columns=["Campo","Valor"])
@@ -151,14 +165,14 @@ arquivo = st.file_uploader("Upload do PDF", type="pdf")
 
 if arquivo:
 
-    parser = FichaFinanceiraParser(arquivo)
-    df, metadados = parser.executar()
+    df, metadados = extrair_ficha(arquivo.getvalue())
 
     if df.empty:
         st.warning("Nenhum dado encontrado.")
     else:
 
-        rubricas = sorted(df["Discriminacao"].unique())
+        # Categorias já ordenadas e todas presentes: dispensam unique() + sorted()
+        rubricas = df["Discriminacao"].cat.categories.tolist()
 
         selecionadas = st.multiselect(
             "Selecione as rubricas para exportar",
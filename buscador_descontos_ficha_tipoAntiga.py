@@ -1,8 +1,10 @@
 import streamlit as st
-import pdfplumber
 import pandas as pd
 import re
 from io import BytesIO
+from functools import lru_cache
+
+from leitura_pdf import extrair_textos
 
 # ---------------- CONFIGURAÇÕES ----------------
 MESES = {
@@ -12,12 +14,22 @@ MESES = {
 }
 
 VALOR_RE = re.compile(r"\d{1,3}(?:\.\d{3})*,\d{2}")
+MES_RE = re.compile("|".join(MESES))  # qualquer sigla de mês em qualquer ponto da linha
 INICIO_FICHA_RE = re.compile(
     r"Siape\s*-\s*Sistema Integrado de Administracao de Recursos Humanos",
     re.IGNORECASE
 )
 FIM_FICHA_RE = re.compile(r"TOTAL\s+L[IÍ]QUIDO", re.IGNORECASE)
 ANO_RE = re.compile(r"Ficha Financeira referente a:\s*(\d{4})", re.IGNORECASE)
+# Os três marcadores numa única varredura: linhas de rubrica (a grande maioria)
+# não casam com nenhum e dispensam as três buscas individuais
+MARCADORES_RE = re.compile(
+    "|".join(padrao.pattern for padrao in (INICIO_FICHA_RE, ANO_RE, FIM_FICHA_RE)),
+    re.IGNORECASE
+)
+
+# "1,234.56" -> "1.234,56" (formatação com separadores do padrão brasileiro)
+TROCA_SEPARADORES = str.maketrans(",.", ".,")
 
 # ---------------- STREAMLIT ----------------
 st.set_page_config(page_title="Extrator SIAPE-FICHA_ANTIGA", layout="wide")
@@ -26,9 +38,12 @@ st.title("📊 Extrator de Rubricas – Ficha Financeira SIAPE")
 pdf_file = st.file_uploader("Envie o PDF da Ficha Financeira", type="pdf")
 
 # ---------------- FUNÇÕES ----------------
+@lru_cache(maxsize=4096)  # as mesmas rubricas se repetem em todas as fichas
 def corrigir_texto(txt: str) -> str:
     if not txt:
         return ""
+    if txt.isascii():  # O(1) no CPython: a maioria das rubricas é ASCII puro
+        return txt
     if "Ã" in txt or "�" in txt:
         try:
             return txt.encode("latin1").decode("utf-8")
@@ -39,85 +54,115 @@ def corrigir_texto(txt: str) -> str:
 
 @st.cache_data(show_spinner=False)
 def extrair_dados(pdf_bytes: bytes) -> pd.DataFrame:
-    registros = []
-
-    linhas = []  # cada item: (texto_linha, pagina_real)
-
-    # 1️⃣ Lê página por página e preserva número REAL
-    with pdfplumber.open(BytesIO(pdf_bytes)) as pdf:
-        for page_num, page in enumerate(pdf.pages, start=1):
-            texto = page.extract_text() or ""
-            for linha in texto.split("\n"):
-                linhas.append((linha, page_num))
+    # Uma lista por coluna: o DataFrame é montado de uma vez, sem um dict por linha
+    registros = {coluna: [] for coluna in ("Discriminacao", "Valor", "Competencia", "Pagina", "Ano", "Tipo")}
 
-    i = 0
     ano_atual = None
     meses_correntes = []
     idx_primeiro_mes = None
 
-    # 2️⃣ Processamento contínuo, MAS com página real
-    while i < len(linhas):
-        linha, pagina_real = linhas[i]
-
-        if INICIO_FICHA_RE.search(linha):
-            ano_atual = None
-            meses_correntes = []
-            idx_primeiro_mes = None
-            i += 1
-            continue
-
-        ano_match = ANO_RE.search(linha)
-        if ano_match:
-            ano_atual = ano_match.group(1)
-            i += 1
-            continue
-
-        if "|" in linha and any(m in linha for m in MESES):
-            colunas = [c.strip() for c in linha.split("|")]
-            meses_correntes = [c for c in colunas if c in MESES]
-            if meses_correntes:
-                idx_primeiro_mes = colunas.index(meses_correntes[0])
-            i += 1
-            continue
-
-        if FIM_FICHA_RE.search(linha):
-            meses_correntes = []
-            idx_primeiro_mes = None
-            i += 1
-            continue
-
-        if meses_correntes and idx_primeiro_mes is not None and "|" in linha:
-            colunas = [c.strip() for c in linha.split("|")]
-            if len(colunas) <= idx_primeiro_mes or not ano_atual:
-                i += 1
+    # Páginas lidas na ordem, com o número REAL de cada uma; o estado
+    # da ficha (ano, meses) segue de uma página para a outra, sem lista de linhas intermediária
+    for pagina_real, texto in enumerate(extrair_textos(pdf_bytes), start=1):
+        for linha in texto.split("\n"):
+            tem_marcador = MARCADORES_RE.search(linha) is not None
+
+            if tem_marcador and INICIO_FICHA_RE.search(linha):
+                ano_atual = None
+                meses_correntes = []
+                idx_primeiro_mes = None
+                continue
+
+            ano_match = ANO_RE.search(linha) if tem_marcador else None
+            if ano_match:
+                ano_atual = ano_match.group(1)
+                continue
+
+            if "|" in linha and MES_RE.search(linha):
+                colunas = [c.strip() for c in linha.split("|")]
+                meses_correntes = [c for c in colunas if c in MESES]
+                if meses_correntes:
+                    idx_primeiro_mes = colunas.index(meses_correntes[0])
                 continue
 
-            rubrica = corrigir_texto(colunas[1])
-            tipo_rd = colunas[2].upper()
-            valores = colunas[idx_primeiro_mes: idx_primeiro_mes + len(meses_correntes)]
+            if tem_marcador and FIM_FICHA_RE.search(linha):
+                meses_correntes = []
+                idx_primeiro_mes = None
+                continue
 
-            for mes_nome, celula in zip(meses_correntes, valores):
-                match = VALOR_RE.search(celula)
-                if match:
-                    registros.append({
-                        "Discriminacao": rubrica,
-                        "Valor": match.group(0),
-                        "Competencia": f"{MESES[mes_nome]}/{ano_atual}",
-                        "Pagina": pagina_real,
-                        "Ano": ano_atual,
-                        "Tipo": "DESCONTO" if "D" in tipo_rd else "RECEITA",
-                        "rubrica": ""
-                    })
+            if meses_correntes and idx_primeiro_mes is not None and "|" in linha:
+                colunas = [c.strip() for c in linha.split("|")]
+                if len(colunas) <= idx_primeiro_mes or not ano_atual:
+                    continue
+
+                rubrica = corrigir_texto(colunas[1])
+                tipo = "DESCONTO" if "D" in colunas[2].upper() else "RECEITA"
+                valores = colunas[idx_primeiro_mes: idx_primeiro_mes + len(meses_correntes)]
+
+                for mes_nome, celula in zip(meses_correntes, valores):
+                    match = VALOR_RE.search(celula)
+                    if match:
+                        registros["Discriminacao"].append(rubrica)
+                        registros["Valor"].append(match.group(0))
+                        registros["Competencia"].append(f"{MESES[mes_nome]}/{ano_atual}")
+                        registros["Pagina"].append(pagina_real)
+                        registros["Ano"].append(ano_atual)
+                        registros["Tipo"].append(tipo)
+
+    # Colunas repetitivas como categoria (códigos inteiros nos filtros isin)
+    df = pd.DataFrame(registros).astype({
+        "Discriminacao": "category",
+        "Competencia": "category",
+        "Pagina": "int16",
+        "Ano": "category",
+        "Tipo": "category"
+    })
+    # Valor numérico ("1.234,56" -> 1234.56), convertido em lote: somas e ordenações não reconvertem texto
+    # (todos já validados pelo VALOR_RE)
+    df["Valor"] = (
+        pd.Series(registros["Valor"], dtype=str)
+        .str.replace(".", "", regex=False)
+        .str.replace(",", ".", regex=False)
+        .astype("float64")
+    )
+    df["rubrica"] = ""
+    return df
 
-        i += 1
 
-    return pd.DataFrame(registros)
+def filtrar(df: pd.DataFrame, rubricas_sel, tipos_sel) -> pd.DataFrame:
+    return df[
+        df["Discriminacao"].isin(rubricas_sel) &
+        df["Tipo"].isin(tipos_sel)
+    ]
+
+
+@st.cache_data(show_spinner=False, max_entries=8)
+def gerar_csv(pdf_bytes: bytes, rubricas_sel: tuple, tipos_sel: tuple) -> bytes:
+    # Chave do cache: PDF + seleções (tuplas); reruns sem mudança de filtro não reescrevem o CSV
+    df_f = filtrar(extrair_dados(pdf_bytes), rubricas_sel, tipos_sel)
+    # Valor no mesmo texto da ficha ("1.234,56", com separador de milhar)
+    df_f = df_f.assign(Valor=df_f["Valor"].map("{:,.2f}".format).str.translate(TROCA_SEPARADORES))
+    # Escrito direto em bytes (com o BOM do utf-8-sig), sem montar a string inteira antes
+    csv = BytesIO()
+    df_f[
+        [
+            "Discriminacao",
+            "Valor",
+            "Competencia",
+            "Pagina",
+            "Ano",
+            "Tipo",
+            "rubrica"
+        ]
+    ].to_csv(csv, index=False, sep=";", encoding="utf-8-sig")
+    return csv.getvalue()
 
 
 # ---------------- EXECUÇÃO ----------------
 if pdf_file:
+    pdf_bytes = pdf_file.getvalue()
     with st.spinner("Processando PDF..."):
-        df = extrair_dados(pdf_file.read())
+        df = extrair_dados(pdf_bytes)
 
     if df.empty:
         st.warning("Nenhum dado encontrado.")
@@ -128,11 +173,14 @@ if pdf_file:
     # -------- FILTROS --------
     col1, col2 = st.columns(2)
 
+    # Categorias já ordenadas e todas presentes: dispensam unique() + sorted()
+    rubricas = df["Discriminacao"].cat.categories.tolist()
+
     with col1:
         rubricas_sel = st.multiselect(
             "Rubricas",
-            sorted(df["Discriminacao"].unique()),
-            default=df["Discriminacao"].unique()
+            rubricas,
+            default=rubricas
         )
 
     with col2:
@@ -142,29 +190,23 @@ if pdf_file:
             default=["DESCONTO", "RECEITA"]
         )
 
-    df_f = df[
-        df["Discriminacao"].isin(rubricas_sel) &
-        df["Tipo"].isin(tipos_sel)
-    ]
-
-    st.dataframe(df_f, use_container_width=True, hide_index=True)
+    df_f = filtrar(df, rubricas_sel, tipos_sel)
+
+    # Valor formatado pelo navegador (separadores do idioma local, 2 casas),
+    # sem alterar a coluna numérica
+    st.dataframe(
+        df_f,
+        column_config={
+            "Valor": st.column_config.NumberColumn(format="localized", step=0.01)
+        },
+        use_container_width=True,
+        hide_index=True
+    )
 
     # -------- EXPORTAÇÃO FINAL --------
-    csv = df_f[
-        [
-            "Discriminacao",
-            "Valor",
-            "Competencia",
-            "Pagina",
-            "Ano",
-            "Tipo",
-            "rubrica"
-        ]
-    ].to_csv(index=False, sep=";", encoding="utf-8-sig")
-
     st.download_button(
         "📥 Baixar CSV",
-        data=csv,
+        data=gerar_csv(pdf_bytes, tuple(rubricas_sel), tuple(tipos_sel)),
         file_name="extracao_siape_paginas_reais.csv",
         mime="text/csv"
     )
@@ -501,27 +501,27 @@ def criar_relatorio_filtros(df_filtrado, filtros_aplicados):
         
         # CORREÇÃO 2: Ordenar do mais antigo para o mais recente
         if 'Data Chegada' in df_filtrado.columns:
-            # Converter para datetime para ordenação correta
-            df_filtrado_temp = df_filtrado.copy()
-            df_filtrado_temp['Data Chegada DT'] = pd.to_datetime(
-                df_filtrado_temp['Data Chegada'], 
+            # Converter para datetime só para obter a ordem (sem cópia nem coluna temporária)
+            datas_chegada = pd.to_datetime(
+                df_filtrado['Data Chegada'], 
                 format='%d/%m/%Y', 
-                errors='coerce'
+                errors='coerce',
+                cache=True  # poucas datas distintas: cada uma é convertida uma vez
             )
-            df_filtrado_temp = df_filtrado_temp.sort_values('Data Chegada DT', ascending=True)  # Mais antigo primeiro
-            df_ordenado = df_filtrado_temp.drop('Data Chegada DT', axis=1)
+            ordem = np.argsort(datas_chegada.to_numpy(), kind='stable')  # Mais antigo primeiro; NaT ao final
+            df_ordenado = df_filtrado.iloc[ordem]
         else:
             df_ordenado = df_filtrado
         
         # CORREÇÃO 3: Destacar processos com mais de 90 dias
         data_hoje = get_local_time().date()
         
-        for _, row in df_ordenado.iterrows():
-            n_processo = str(row['Nº Processo']) if pd.notna(row['Nº Processo']) else ''
-            polo_ativo = str(row['Polo Ativo']) if pd.notna(row['Polo Ativo']) else ''
-            data_chegada = str(row['Data Chegada']) if pd.notna(row['Data Chegada']) else ''
-            servidor = str(row['Servidor']) if pd.notna(row['Servidor']) else ''
-            assunto = str(row['Assunto Principal']) if pd.notna(row['Assunto Principal']) else ''
+        # Colunas do relatório como listas de texto ('' quando ausente), sem montar uma Series por linha
+        colunas_texto = [
+            [str(valor) if pd.notna(valor) else '' for valor in df_ordenado[coluna]]
+            for coluna in ('Nº Processo', 'Polo Ativo', 'Data Chegada', 'Servidor', 'Assunto Principal')
+        ]
+        for n_processo, polo_ativo, data_chegada, servidor, assunto in zip(*colunas_texto):
             
             # Verificar se tem mais de 90 dias
             try:
@@ -701,12 +701,15 @@ def main():
             
         # 4. Aplicar Atribuições Manuais 
         if not st.session_state.atribuicoes_servidores.empty:
-            df_atribuicoes = st.session_state.atribuicoes_servidores[['NUMERO_PROCESSO', 'servidor']].copy()
-
-            for index, row in df_atribuicoes.iterrows():
-                match_index = processed_df.index[processed_df['NUMERO_PROCESSO'] == row['NUMERO_PROCESSO']]
-                if not match_index.empty:
-                    processed_df.loc[match_index, 'servidor'] = row['servidor']
+            # Processo -> servidor (vale a última atribuição, como no laço linha a linha)
+            atribuicoes = (
+                st.session_state.atribuicoes_servidores
+                .dropna(subset=['NUMERO_PROCESSO'])
+                .drop_duplicates(subset=['NUMERO_PROCESSO'], keep='last')
+                .set_index('NUMERO_PROCESSO')['servidor']
+            )
+            atribuidos = processed_df['NUMERO_PROCESSO'].isin(atribuicoes.index)
+            processed_df.loc[atribuidos, 'servidor'] = processed_df.loc[atribuidos, 'NUMERO_PROCESSO'].map(atribuicoes)
                     
         stats = criar_estatisticas(processed_df)
                     
@@ -901,29 +904,32 @@ def main():
                     default=None
                 )
             
-            filtered_df = processed_df.copy()
+            # Filtros combinados numa única máscara e um único recorte (sem cópia intermediária)
+            mascara = np.ones(len(processed_df), dtype=bool)
             filtros_aplicados = []
             
             if servidor_filter:
-                filtered_df = filtered_df[filtered_df['servidor'].isin(servidor_filter)]
+                mascara &= processed_df['servidor'].isin(servidor_filter).to_numpy()
                 filtros_aplicados.append(f"Servidor: {', '.join(servidor_filter)}")
             
-            if mes_filter and 'mes' in filtered_df.columns:
-                filtered_df = filtered_df[filtered_df['mes'].isin(mes_filter)]
+            if mes_filter and 'mes' in processed_df.columns:
+                mascara &= processed_df['mes'].isin(mes_filter).to_numpy()
                 filtros_aplicados.append(f"Mês (Chegada): {', '.join(map(str, mes_filter))}")
             
-            if polo_passivo_filter and 'POLO_PASSIVO' in filtered_df.columns:
-                filtered_df = filtered_df[filtered_df['POLO_PASSIVO'].isin(polo_passivo_filter)]
+            if polo_passivo_filter and 'POLO_PASSIVO' in processed_df.columns:
+                mascara &= processed_df['POLO_PASSIVO'].isin(polo_passivo_filter).to_numpy()
                 filtros_aplicados.append(f"Polo Passivo: {', '.join(polo_passivo_filter)}")
             
-            if assunto_filter and 'ASSUNTO_PRINCIPAL' in filtered_df.columns:
-                filtered_df = filtered_df[filtered_df['ASSUNTO_PRINCIPAL'].isin(assunto_filter)]
+            if assunto_filter and 'ASSUNTO_PRINCIPAL' in processed_df.columns:
+                mascara &= processed_df['ASSUNTO_PRINCIPAL'].isin(assunto_filter).to_numpy()
                 filtros_aplicados.append(f"Assunto: {', '.join(assunto_filter)}")
             
-            if vara_filter and 'vara' in filtered_df.columns:
-                filtered_df = filtered_df[filtered_df['vara'].isin(vara_filter)]
+            if vara_filter and 'vara' in processed_df.columns:
+                mascara &= processed_df['vara'].isin(vara_filter).to_numpy()
                 filtros_aplicados.append(f"Vara: {', '.join(vara_filter)}")
             
+            filtered_df = processed_df[mascara]
+            
             filtros_texto = " | ".join(filtros_aplicados) if filtros_aplicados else "Nenhum filtro aplicado"
             
             st.metric("Processos Filtrados", len(filtered_df))
@@ -0,0 +1,104 @@
+"""Leitura do texto de PDFs, compartilhada pelos extratores de fichas e relatórios.
+
+Por padrão as páginas são lidas em sequência, no próprio processo do Streamlit.
+A leitura em vários processos é opcional (variável de ambiente
+CONTADJEFS_PROCESSOS=N, com N >= 2) e usa sempre o método "spawn": o servidor do
+Streamlit roda várias threads, e um fork nesse estado pode travar. As funções
+executadas nos processos ficam neste módulo, importável pelos filhos (as do
+script principal não são).
+
+O motor de texto também é configurável (CONTADJEFS_MOTOR_PDF): o padrão é o
+pdfplumber, com o qual os extratores foram validados. O PyMuPDF é bem mais
+rápido, mas espaça e quebra as linhas de outro jeito; é opcional e tem os
+espaços normalizados antes de chegar às regexes.
+"""
+import multiprocessing
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+from itertools import chain, repeat
+
+import pdfplumber
+
+try:
+    import pymupdf  # PyMuPDF: extração de texto feita em C (MuPDF), bem mais rápida
+except ImportError:
+    pymupdf = None
+
+# Abaixo deste número de páginas o custo de subir processos não compensa
+PAGINAS_MIN_PARALELO = 4
+
+# Espaços horizontais (o MuPDF preserva o espaçamento do PDF; o pdfplumber, não)
+ESPACOS_RE = re.compile(r"[^\S\n]+")
+
+
+def processos_configurados():
+    """Número de processos pedido em CONTADJEFS_PROCESSOS (1 = leitura sequencial)."""
+    return max(int(os.environ.get("CONTADJEFS_PROCESSOS") or 1), 1)
+
+
+def motor_configurado():
+    """Motor de texto pedido em CONTADJEFS_MOTOR_PDF ("pdfplumber", o padrão, ou "pymupdf")."""
+    motor = (os.environ.get("CONTADJEFS_MOTOR_PDF") or "pdfplumber").lower()
+    if motor not in ("pdfplumber", "pymupdf"):
+        raise ValueError(f"CONTADJEFS_MOTOR_PDF inválido: {motor!r}")
+    if motor == "pymupdf" and pymupdf is None:
+        raise ImportError("CONTADJEFS_MOTOR_PDF=pymupdf, mas o PyMuPDF não está instalado")
+    return motor
+
+
+def normalizar_espacos(texto):
+    """Espaços simples, sem sobras nas pontas nem linhas vazias, como no texto do pdfplumber."""
+    linhas = (ESPACOS_RE.sub(" ", linha).strip() for linha in texto.split("\n"))
+    return "\n".join(linha for linha in linhas if linha)
+
+
+def textos_pymupdf(pdf_bytes, termo=None):
+    """Texto de todas as páginas pelo PyMuPDF (rápido o bastante para dispensar processos)."""
+    with pymupdf.open(stream=pdf_bytes, filetype="pdf") as doc:
+        # sort=True devolve o texto na ordem de leitura (linha a linha)
+        textos = [normalizar_espacos(page.get_text(sort=True)) for page in doc]
+    if termo:
+        textos = [texto if termo in "".join(texto.split()).upper() else "" for texto in textos]
+    return textos
+
+
+def texto_pagina(pagina, termo=None):
+    """Texto da página; com `termo`, páginas que não o contêm voltam vazias sem análise de layout."""
+    try:
+        # Filtro sobre o texto simples (caracteres agrupados por linha e ordenados pela
+        # posição, não pela ordem de desenho no PDF), sem espaços: títulos espaçados
+        # ou em partes ainda casam
+        if termo and termo not in "".join(pagina.extract_text_simple().split()).upper():
+            return ""
+        return pagina.extract_text() or ""
+    finally:
+        pagina.close()  # libera chars/textmap em cache: só o texto é usado
+
+
+def textos_intervalo(pdf_bytes, inicio, fim, termo=None):
+    """Texto de um intervalo de páginas (também o trabalho de cada processo)."""
+    with pdfplumber.open(BytesIO(pdf_bytes)) as pdf:
+        return [texto_pagina(pagina, termo) for pagina in pdf.pages[inicio:fim]]
+
+
+def extrair_textos(pdf_bytes, termo=None):
+    """Texto de todas as páginas, na ordem do PDF."""
+    if motor_configurado() == "pymupdf":
+        return textos_pymupdf(pdf_bytes, termo)
+
+    with pdfplumber.open(BytesIO(pdf_bytes)) as pdf:
+        n_paginas = len(pdf.pages)
+        n_processos = min(processos_configurados(), n_paginas)
+        if n_processos < 2 or n_paginas <= PAGINAS_MIN_PARALELO:
+            return [texto_pagina(pagina, termo) for pagina in pdf.pages]
+
+    # Intervalos contíguos de páginas, um por processo (o map preserva a ordem)
+    tamanho = -(-n_paginas // n_processos)
+    inicios = list(range(0, n_paginas, tamanho))
+    fins = [min(inicio + tamanho, n_paginas) for inicio in inicios]
+    contexto = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=len(inicios), mp_context=contexto) as executor:
+        partes = executor.map(textos_intervalo, repeat(pdf_bytes), inicios, fins, repeat(termo))
+        return list(chain.from_iterable(partes))